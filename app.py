@@ -1,14 +1,33 @@
-from flask import Flask, render_template, request, redirect, url_for, session, send_file, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, send_file, send_from_directory, jsonify, Response, stream_with_context, has_request_context
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import inspect, func
+from sqlalchemy import inspect, func, select, insert, update, and_, or_, exists, text, tuple_, event
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import DBAPIError, OperationalError
+import click
 import os
-import pandas as pd
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, date, timezone, timedelta
 import uuid
+import time
+import random
+import socket
+import sqlite3
+import bisect
+from collections import OrderedDict
 import io
+import csv
+import gzip
+import tempfile
+import queue
+import atexit
 import threading
-from googleapiclient.discovery import build
+import contextlib
+import hmac
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
+import math
+from types import SimpleNamespace
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -21,15 +40,118 @@ app.secret_key = 'a-new-secret-key-for-top100-crawl'
 db_url = os.environ.get('DATABASE_URL')
 if db_url and db_url.startswith("postgres://"):
     db_url = db_url.replace("postgres://", "postgresql://", 1)
+db_read_url = os.environ.get('DATABASE_READ_URL')  # 설정하면 관리자 화면/분석/내보내기 조회를 이 읽기 복제본으로 보낸다
+if db_read_url and db_read_url.startswith("postgres://"):
+    db_read_url = db_read_url.replace("postgres://", "postgresql://", 1)
 app.config['SQLALCHEMY_DATABASE_URI'] = db_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+def _pool_options(url, pool_size, max_overflow):
+    # SQLite 는 SQLAlchemy 기본 풀을 그대로 쓴다
+    if not url or url.startswith('sqlite'): return {}
+    return {'pool_size': pool_size, 'max_overflow': max_overflow, 'pool_pre_ping': True, 'pool_recycle': 1800}
+
+# primary 는 짧은 요청(이벤트 적재, 피드)이 많고, 복제본에는 긴 스캔 몇 개만 동시에 돈다
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = _pool_options(db_url, int(os.environ.get('DB_POOL_SIZE', 5)), int(os.environ.get('DB_MAX_OVERFLOW', 10)))
+if db_read_url:
+    replica_options = _pool_options(db_read_url, int(os.environ.get('DB_READ_POOL_SIZE', 2)), int(os.environ.get('DB_READ_MAX_OVERFLOW', 2)))
+    if db_read_url.startswith('postgresql'): replica_options['execution_options'] = {'postgresql_readonly': True}
+    app.config['SQLALCHEMY_BINDS'] = {'replica': {'url': db_read_url, **replica_options}}
 db = SQLAlchemy(app)
 
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 30000))  # 다른 연결이 쓰기 잠금을 쥐고 있을 때 기다리는 시간 (집계 재계산 동안 이벤트 적재가 기다림)
+
+@event.listens_for(Engine, 'connect')
+def _sqlite_wal(dbapi_connection, connection_record):
+    # SQLite 는 WAL 모드여야 작업 러너/이벤트 writer 의 쓰기가 진행 중인 읽기(내보내기 등)에 막히지 않는다.
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.execute('PRAGMA journal_mode=WAL')
+        dbapi_connection.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+
 # --- 외부 설정 및 전역 변수 ---
 YOUTUBE_API_KEY = os.environ.get('YOUTUBE_API_KEY')
-CRAWL_STATUS = {'is_running': False, 'progress': '대기 중'}
+YOUTUBE_DISCOVERY_DOC = os.environ.get('YOUTUBE_DISCOVERY_DOC', os.path.join(basedir, 'youtube.v3.json'))  # 없으면 google-api-python-client 에 포함된 문서를 쓴다
+YOUTUBE_DISCOVERY_URL = 'https://www.googleapis.com/discovery/v1/apis/youtube/v3/rest'
 KST = timezone(timedelta(hours=9))
 
+# --- 읽기 복제본 설정 ---
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 30))  # 복제 지연이 이 초를 넘으면 primary 에서 읽는다
+REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', 5))  # 복제 지연을 다시 확인하는 간격(초)
+
+# --- 이벤트 적재(write-behind 큐) 설정 ---
+EVENT_WRITE_BEHIND = os.environ.get('EVENT_WRITE_BEHIND', '1') == '1'
+EVENT_QUEUE_MAXSIZE = int(os.environ.get('EVENT_QUEUE_MAXSIZE', 1000))
+EVENT_QUEUE_PUT_TIMEOUT = float(os.environ.get('EVENT_QUEUE_PUT_TIMEOUT', 2))
+EVENT_BATCH_MAX_EVENTS = int(os.environ.get('EVENT_BATCH_MAX_EVENTS', 500))
+EVENT_MAX_AGE_MS = 10 * 60 * 1000
+EVENT_WRITE_RETRIES = int(os.environ.get('EVENT_WRITE_RETRIES', 8))  # 잠금 대기 초과·연결 끊김 등 일시적 DB 오류 재시도 횟수
+EVENT_WRITE_RETRY_MAX_DELAY = float(os.environ.get('EVENT_WRITE_RETRY_MAX_DELAY', 30))
+NON_ACTIVITY_EVENTS = ['로그인', '시청시작', '시청중지_종료', '댓글클릭', '댓글닫기클릭']
+# 활동 이벤트 → (shorts_activity 컬럼, 함께 0 으로 되돌리는 컬럼). 이벤트 이름 뒤에 '취소' 가 붙으면 0, 아니면 1 을 기록한다.
+ACTIVITY_EVENT_COLUMNS = {'좋아요': ('like', 'dislike'), '싫어요': ('dislike', 'like'), '공유': ('share', None), '관심없음': ('interest', None), '채널추천안함': ('recommend', None), '신고': ('report', None), '구독': ('subscribe', None)}
+ACTIVITY_COLUMNS = [column for column, _ in ACTIVITY_EVENT_COLUMNS.values()]
+
+# --- 숏츠 피드 설정 ---
+SHORTS_CACHE_TTL = float(os.environ.get('SHORTS_CACHE_TTL', 60))
+SHORTS_PAGE_SIZE = 5
+SHORTS_PAGE_MAX = 50
+
+# --- 댓글 캐시 설정 ---
+COMMENT_CACHE_SIZE = int(os.environ.get('COMMENT_CACHE_SIZE', 256))
+COMMENT_PAGE_SIZE = 20
+COMMENT_PAGE_MAX = 100
+
+# --- 사용자 활동 캐시 설정 ---
+ACTIVITY_CACHE_SIZE = int(os.environ.get('ACTIVITY_CACHE_SIZE', 10000))
+
+# --- 측정결과 설정 ---
+# 'aggregate': 적재 시 갱신되는 measurement_aggregate 테이블을 읽음 / 'events': event_log 전체를 pandas로 재계산
+MEASUREMENT_SOURCE = os.environ.get('MEASUREMENT_SOURCE', 'aggregate')
+# --- 백그라운드 작업 설정 ---
+# 작업은 `flask run_jobs` 프로세스 하나가 실행한다. 1이면 이 프로세스도 기동 시 러너 스레드를 띄운다 (단일 프로세스 배포용).
+# 웹 워커마다 러너가 돌면 워커 수만큼 폴링/정리 쿼리가 생기므로 gunicorn 워커에서는 켜지 않는다.
+JOB_RUNNER = os.environ.get('JOB_RUNNER', '0') == '1'
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2))
+JOB_HEARTBEAT_INTERVAL = 15
+JOB_STALE_AFTER = timedelta(minutes=2)  # 이 시간 동안 heartbeat 가 없으면 작업자가 죽은 것으로 보고 실패 처리
+JOB_PROGRESS_INTERVAL = 1.0  # 진행 상황을 DB 에 쓰는 최소 간격(초)
+JOB_OUTPUT_DIR = os.environ.get('JOB_OUTPUT_DIR', os.path.join(basedir, 'job_outputs'))
+# --- 이벤트 파티션/요약 설정 ---
+EVENT_PARTITION_PERIOD = os.environ.get('EVENT_PARTITION_PERIOD', 'month')  # 'day' 또는 'month'
+EVENT_PARTITIONS_AHEAD = 2  # 미리 만들어 두는 이후 기간 파티션 수 (PostgreSQL)
+EVENT_ROLLUP_GRACE = timedelta(hours=1)  # 자정 이후 이 시간이 지나야 전날을 닫힌 날짜로 보고 요약한다 (늦게 도착하는 이벤트 여유)
+EVENT_RETENTION_DAYS = int(os.environ.get('EVENT_RETENTION_DAYS', 0))  # 0이면 원본 이벤트를 계속 보관
+EVENT_RETENTION_ARCHIVE = os.environ.get('EVENT_RETENTION_ARCHIVE', '1') == '1'  # 지우기 전에 ARCHIVE_DIR 에 csv.gz 로 백업
+EVENT_MAINTENANCE_INTERVAL = float(os.environ.get('EVENT_MAINTENANCE_INTERVAL', 3600))  # maintain_events 작업을 자동 등록하는 간격(초). 0이면 끔
+# --- 관리자 테이블 조회 설정 ---
+ADMIN_PAGE_SIZE = 100
+SCHEMA_CACHE_TTL = float(os.environ.get('SCHEMA_CACHE_TTL', 300))  # 다른 프로세스(CLI 등)에서 바꾼 스키마가 반영되기까지의 최대 시간(초)
+# --- 관리자 내보내기 설정 ---
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+EXPORT_SPOOL_MAX_BYTES = int(os.environ.get('EXPORT_SPOOL_MAX_BYTES', 8 * 1024 * 1024))
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+MEASUREMENT_COLUMNS = ['login_id', 'shorts_url', '시청시간(S)', '좋아요', '싫어요', '댓글시간(S)', '댓글작성', '공유', '관심없음', '채널추천안함', '신고']
+# --- 테이블 초기화 백업 설정 ---
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', os.path.join(basedir, 'archives'))
+ARCHIVE_CHUNK_SIZE = int(os.environ.get('ARCHIVE_CHUNK_SIZE', 5000))
+# --- 관리자 업로드 설정 ---
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 1000))
+UPLOAD_ERROR_LIMIT = 50  # 화면에 보여 줄 행 오류 수
+UPLOAD_MERGE_KEYS = {'login_user': 'id', 'shorts': 'url'}  # upsert 시 기준 컬럼
+
+# --- 댓글 크롤러 설정 ---
+CRAWL_WORKERS = int(os.environ.get('CRAWL_WORKERS', 4))
+CRAWL_MAX_COMMENTS = int(os.environ.get('CRAWL_MAX_COMMENTS', 100))  # 영상당 최대 댓글 스레드 수 (nextPageToken 으로 이어서 수집)
+CRAWL_REQUESTS_PER_SECOND = float(os.environ.get('CRAWL_REQUESTS_PER_SECOND', 5))
+CRAWL_DAILY_QUOTA = int(os.environ.get('CRAWL_DAILY_QUOTA', 10000))  # Data API 일일 할당량(단위). commentThreads.list 는 호출당 1단위
+CRAWL_MAX_RETRIES = 5
+CRAWL_RETRY_STATUSES = {429, 500, 502, 503, 504}
+# --- 성능 계측 설정 ---
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'  # 0이면 요청/SQL 훅을 등록하지 않음
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # 설정하면 로그인 없이 'Authorization: Bearer <토큰>' 으로 /admin/metrics 를 읽을 수 있음
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 500))  # 이보다 오래 걸린 SQL 은 경고 로그로 남김. 0이면 끔
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # 히스토그램 구간 상한(초)
+
 
 # --- 데이터베이스 모델 정의 ---
 class LoginUser(db.Model):
@@ -46,6 +168,7 @@ class Shorts(db.Model):
     channel_profile_url = db.Column(db.String(200))
     description = db.Column(db.String(200))
     use_yn = db.Column(db.String(1), default='Y', nullable=False)
+    __table_args__ = (db.Index('ix_shorts_use_yn', 'use_yn'),)
 
 class YoutubeComment(db.Model):
     __tablename__ = 'youtube_comment'
@@ -55,17 +178,19 @@ class YoutubeComment(db.Model):
     parent_id = db.Column(db.String(100), nullable=True)
     author_name = db.Column(db.String(100))
     comment_text = db.Column(db.Text)
-    published_at = db.Column(db.String(50))
+    published_at = db.Column(db.DateTime(timezone=True))
     like_count = db.Column(db.Integer)
     author_profile_image_url = db.Column(db.String(200))
+    __table_args__ = (db.Index('ix_youtube_comment_shorts_published', 'shorts_url', 'published_at'), db.Index('ix_youtube_comment_parent_id', 'parent_id'))
 
 class EventLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     login_id = db.Column(db.String(80), nullable=False)
     shorts_url = db.Column(db.String(200), nullable=False)
-    event_timestamp = db.Column(db.String(50), nullable=False)
+    event_timestamp = db.Column(db.DateTime(timezone=True), nullable=False)
     event_type = db.Column(db.String(50), nullable=False)
     session_id = db.Column(db.String(100), nullable=False)
+    __table_args__ = (db.Index('ix_event_log_login_shorts', 'login_id', 'shorts_url'), db.Index('ix_event_log_timestamp', 'event_timestamp'))
 
 class ShortsActivity(db.Model):
     __tablename__ = 'shorts_activity'
@@ -85,14 +210,300 @@ class UserLastState(db.Model):
     __tablename__ = 'user_last_state'
     login_id = db.Column(db.String(80), primary_key=True)
     last_watched_url = db.Column(db.String(200))
+    last_watched_at = db.Column(db.DateTime)  # last_watched_url 을 정한 시청시작 이벤트 시각 (KST), 늦게 커밋된 옛 이벤트가 덮지 않도록
+    activity_version = db.Column(db.String(32))  # 이 사용자의 활동/마지막 시청이 바뀔 때마다 새로 뽑는 값 (워커 간 활동 캐시 검증용)
+
+class MeasurementAggregate(db.Model):
+    # (login_id, shorts_url)별 측정결과 누적값. 이벤트 적재 시 증분 갱신되며 open_* 는 아직 닫히지 않은 구간의 시작 시각.
+    __tablename__ = 'measurement_aggregate'
+    id = db.Column(db.Integer, primary_key=True)
+    login_id = db.Column(db.String(80), nullable=False)
+    shorts_url = db.Column(db.String(200), nullable=False)
+    watch_seconds = db.Column(db.Float, default=0, nullable=False)
+    comment_seconds = db.Column(db.Float, default=0, nullable=False)
+    first_start_at = db.Column(db.DateTime)
+    last_like_at = db.Column(db.DateTime)
+    last_dislike_at = db.Column(db.DateTime)
+    commented = db.Column(db.Integer, default=0, nullable=False)
+    open_watch_start = db.Column(db.DateTime)
+    open_comment_start = db.Column(db.DateTime)
+    last_event_at = db.Column(db.DateTime)  # 반영한 가장 늦은 이벤트 시각. 이보다 이른 이벤트가 늦게 오면 이 쌍을 다시 계산한다.
+    __table_args__ = (db.UniqueConstraint('login_id', 'shorts_url', name='_measurement_login_shorts_uc'),)
+
+class EventRollup(db.Model):
+    # 닫힌 날짜의 event_log 를 (login_id, shorts_url, 날짜)로 접은 요약. open_* 는 그날이 끝날 때 열려 있던 구간의 시작 시각(다음 날로 이어짐).
+    __tablename__ = 'event_rollup'
+    id = db.Column(db.Integer, primary_key=True)
+    login_id = db.Column(db.String(80), nullable=False)
+    shorts_url = db.Column(db.String(200), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    event_count = db.Column(db.Integer, default=0, nullable=False)
+    watch_seconds = db.Column(db.Float, default=0, nullable=False)
+    comment_seconds = db.Column(db.Float, default=0, nullable=False)
+    first_start_at = db.Column(db.DateTime)
+    last_like_at = db.Column(db.DateTime)
+    last_dislike_at = db.Column(db.DateTime)
+    open_watch_start = db.Column(db.DateTime)
+    open_comment_start = db.Column(db.DateTime)
+    __table_args__ = (db.UniqueConstraint('login_id', 'shorts_url', 'day', name='_event_rollup_login_shorts_day_uc'), db.Index('ix_event_rollup_day', 'day'))
+
+class EventCompaction(db.Model):
+    # 요약이 끝난 경계(KST). 이 시각 이전의 원본 이벤트는 event_rollup 으로 대신 읽는다.
+    __tablename__ = 'event_compaction'
+    id = db.Column(db.Integer, primary_key=True)
+    compacted_until = db.Column(db.DateTime, nullable=False)
+
+class BackgroundJob(db.Model):
+    # 여러 워커가 공유하는 작업 큐. status: queued → running → succeeded / failed / cancelled
+    __tablename__ = 'background_job'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    params = db.Column(db.JSON)
+    progress = db.Column(db.String(300))
+    counters = db.Column(db.JSON)
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    cancel_requested = db.Column(db.Integer, default=0, nullable=False)
+    worker = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    started_at = db.Column(db.DateTime(timezone=True))
+    heartbeat_at = db.Column(db.DateTime(timezone=True))
+    finished_at = db.Column(db.DateTime(timezone=True))
+    __table_args__ = (db.Index('ix_background_job_status', 'status', 'id'), db.Index('ix_background_job_kind', 'kind', 'id'))
+
+class CrawlRun(db.Model):
+    # 댓글 크롤링 실행 단위. 중단(interrupted, 프로세스 종료로 running 에 멈춘 것 포함)되거나 할당량이 소진된 실행만 finished_at 이 비어 있고, 다음 크롤링 때 이어서 진행한다.
+    __tablename__ = 'crawl_run'
+    id = db.Column(db.Integer, primary_key=True)
+    started_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    finished_at = db.Column(db.DateTime(timezone=True))
+    status = db.Column(db.String(20), nullable=False)
+    quota_used = db.Column(db.Integer, default=0, nullable=False)
+
+class CrawlCheckpoint(db.Model):
+    # 실행 중 댓글 교체까지 끝난 영상
+    __tablename__ = 'crawl_checkpoint'
+    run_id = db.Column(db.Integer, primary_key=True)
+    shorts_url = db.Column(db.String(200), primary_key=True)
+    comment_count = db.Column(db.Integer, default=0, nullable=False)
+    completed_at = db.Column(db.DateTime(timezone=True), nullable=False)
 
 MODELS = {
     'login_user': LoginUser, 'shorts': Shorts, 'event_log': EventLog,
     'shorts_activity': ShortsActivity, 'user_last_state': UserLastState,
-    'youtube_comment': YoutubeComment
+    'youtube_comment': YoutubeComment, 'measurement_aggregate': MeasurementAggregate,
+    'event_rollup': EventRollup, 'event_compaction': EventCompaction,
+    'crawl_run': CrawlRun, 'crawl_checkpoint': CrawlCheckpoint, 'background_job': BackgroundJob
 }
 
 
+# --- 시각 변환 ---
+# PostgreSQL 은 timestamptz 로 저장하고, 시간대를 저장하지 못하는 SQLite 에는 KST 벽시계 시각으로 저장한다.
+def as_kst(value):
+    if isinstance(value, str): value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value.replace(tzinfo=KST) if value.tzinfo is None else value.astimezone(KST)
+
+def to_kst_naive(value):
+    return as_kst(value).replace(tzinfo=None)
+
+def kst_naive_series(series):
+    import pandas as pd
+    values = pd.to_datetime(series, errors='coerce')
+    if values.dt.tz is not None: values = values.dt.tz_convert(KST).dt.tz_localize(None)
+    return values
+
+
+# --- 성능 계측 ---
+# 요청별 소요 시간, 요청 안에서 실행된 SQL 수/시간, 느린 쿼리, 이름 붙은 구간(span)의 소요 시간을 프로세스 단위로 모은다.
+# METRICS_ENABLED 가 꺼져 있으면 훅을 등록하지 않고 span() 은 빈 컨텍스트를 돌려준다.
+class Metrics:
+    """카운터/히스토그램 저장소. 레이블은 ((이름, 값), ...) 튜플입니다."""
+    def __init__(self, buckets=METRICS_BUCKETS):
+        self.buckets = buckets
+        self.counters, self.histograms, self.gauges = {}, {}, {}
+        self.lock = threading.Lock()
+
+    def inc(self, name, labels=(), amount=1):
+        with self.lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0) + amount
+
+    def observe(self, name, labels, seconds):
+        with self.lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None: histogram = self.histograms[(name, labels)] = [[0] * len(self.buckets), 0.0, 0]
+            i = bisect.bisect_left(self.buckets, seconds)
+            if i < len(self.buckets): histogram[0][i] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def gauge(self, name, read):
+        # 내보낼 때 read() 를 호출해 현재 값을 읽는다
+        self.gauges[name] = read
+
+    def render(self):
+        """Prometheus 텍스트 형식(0.0.4)."""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, (list(h[0]), h[1], h[2])) for key, h in self.histograms.items())
+        lines, typed = [], set()
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+        for (name, labels), value in counters:
+            declare(name, 'counter')
+            lines.append(f"{name}{_metric_labels(labels)} {value}")
+        for (name, labels), (buckets, total, count) in histograms:
+            declare(name, 'histogram')
+            cumulative = 0
+            for bound, n in zip(self.buckets, buckets):
+                cumulative += n
+                lines.append(f"{name}_bucket{_metric_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_metric_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_metric_labels(labels)} {total}")
+            lines.append(f"{name}_count{_metric_labels(labels)} {count}")
+        for name, read in sorted(self.gauges.items()):
+            declare(name, 'gauge')
+            lines.append(f"{name} {read()}")
+        return '\n'.join(lines) + '\n'
+
+def _metric_labels(labels):
+    if not labels: return ''
+    escape = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in labels) + '}'
+
+metrics = Metrics()
+_metrics_local = threading.local()
+
+class _Span:
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        metrics.observe('span_duration_seconds', (('span', self.name),), time.perf_counter() - self.started)
+
+_NO_SPAN = contextlib.nullcontext()
+
+def span(name):
+    """이름 붙은 구간의 소요 시간을 span_duration_seconds 히스토그램에 기록합니다."""
+    return _Span(name) if METRICS_ENABLED else _NO_SPAN
+
+def _metrics_before_request():
+    _metrics_local.request = [time.perf_counter(), 0, 0.0]  # 시작 시각, SQL 수, SQL 시간
+
+def _metrics_after_request(response):
+    # 스트리밍 응답은 본문을 보내기 전까지의 시간만 잰다
+    state = getattr(_metrics_local, 'request', None)
+    if state is None: return response
+    _metrics_local.request = None
+    elapsed = time.perf_counter() - state[0]
+    endpoint = request.endpoint or 'unknown'
+    metrics.observe('http_request_duration_seconds', (('endpoint', endpoint), ('method', request.method)), elapsed)
+    metrics.inc('http_requests_total', (('endpoint', endpoint), ('method', request.method), ('status', str(response.status_code))))
+    metrics.inc('http_request_queries_total', (('endpoint', endpoint),), state[1])
+    metrics.inc('http_request_query_seconds_total', (('endpoint', endpoint),), state[2])
+    response.headers['Server-Timing'] = f'app;dur={elapsed * 1000:.1f}, db;dur={state[2] * 1000:.1f};desc="{state[1]} queries"'
+    return response
+
+def _statement_kind(statement):
+    kind = statement.lstrip()[:6].upper()
+    return kind if kind in ('SELECT', 'INSERT', 'UPDATE', 'DELETE') else 'OTHER'
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    kind = _statement_kind(statement)
+    metrics.observe('db_query_duration_seconds', (('statement', kind),), elapsed)
+    state = getattr(_metrics_local, 'request', None)
+    if state is not None:
+        state[1] += 1
+        state[2] += elapsed
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        metrics.inc('db_slow_queries_total', (('statement', kind),))
+        source = request.endpoint if has_request_context() else threading.current_thread().name
+        app.logger.warning("느린 쿼리 %.0fms (%s): %s", elapsed * 1000, source, ' '.join(statement.split())[:500])
+
+def _query_failed(exception_context):
+    started = exception_context.connection.info.get('query_started') if exception_context.connection is not None else None
+    if started: started.pop()
+
+if METRICS_ENABLED:
+    app.before_request(_metrics_before_request)
+    app.after_request(_metrics_after_request)
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _query_failed)
+    metrics.gauge('event_queue_size', lambda: _event_queue.qsize())
+
+@app.route('/admin/metrics')
+def metrics_endpoint():
+    # 관리자 세션 또는 METRICS_TOKEN (Prometheus 수집용)
+    authorization = request.headers.get('Authorization')
+    if session.get('user_role') not in ['admin', 'super_admin']:
+        if not authorization: return redirect(url_for('login_page'))
+        if not METRICS_TOKEN or not hmac.compare_digest(authorization, f"Bearer {METRICS_TOKEN}"): return "Unauthorized", 401
+    if not METRICS_ENABLED: return "Metrics are disabled", 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+# --- 읽기 복제본 라우팅 ---
+# 관리자 테이블 조회, 측정결과, 내보내기처럼 큰 스캔은 DATABASE_READ_URL 복제본에서 읽는다.
+# 쓰기와 사용자 화면의 상태 조회(/shorts, /log_event 등)는 항상 primary(db.session) 를 쓴다.
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END")
+_replica_state = {'usable': False, 'lag': None, 'checked_at': None}
+_replica_lock = threading.Lock()
+
+def replica_lag_seconds(engine):
+    # PostgreSQL 스트리밍 복제 지연(초). 받은 WAL 을 모두 재생했으면 0. 다른 DB 는 지연을 알 수 없어 0 으로 본다.
+    if engine.dialect.name != 'postgresql': return 0.0
+    with engine.connect() as conn:
+        return float(conn.execute(REPLICA_LAG_SQL).scalar() or 0)
+
+def read_engine():
+    """분석/관리자 조회용 엔진. 복제본이 없거나 응답하지 않거나 REPLICA_MAX_LAG 초 넘게 뒤처져 있으면 primary 를 돌려줍니다."""
+    if not db_read_url: return db.engine
+    with _replica_lock:
+        if _replica_state['checked_at'] is None or time.monotonic() - _replica_state['checked_at'] > REPLICA_CHECK_INTERVAL:
+            try:
+                lag = replica_lag_seconds(db.engines['replica'])
+                usable = lag <= REPLICA_MAX_LAG
+                if not usable: app.logger.warning("읽기 복제본이 %.1f초 뒤처져 있어 primary 에서 읽습니다.", lag)
+            except Exception as e:
+                lag, usable = None, False
+                app.logger.warning("읽기 복제본에 연결할 수 없어 primary 에서 읽습니다: %s", e)
+            _replica_state.update(usable=usable, lag=lag, checked_at=time.monotonic())
+        usable = _replica_state['usable']
+    if METRICS_ENABLED: metrics.inc('db_read_route_total', (('target', 'replica' if usable else 'primary'),))
+    return db.engines['replica'] if usable else db.engine
+
+@contextlib.contextmanager
+def read_session():
+    # 읽기 엔진에 붙는 별도 세션. 복제본을 쓰지 않을 때는 요청 세션(db.session)을 그대로 쓴다.
+    engine = read_engine()
+    if engine is db.engine:
+        yield db.session
+        return
+    session = Session(bind=engine)
+    try:
+        yield session
+    finally:
+        session.close()
+
+if METRICS_ENABLED and db_read_url: metrics.gauge('db_replica_lag_seconds', lambda: _replica_state['lag'] if _replica_state['lag'] is not None else 'NaN')
+
+
 # --- 사용자 페이지 라우팅 ---
 @app.route('/')
 def login_page():
@@ -123,16 +534,50 @@ def handle_login():
 def shorts_page():
     if session.get('user_role') != 'user': return redirect(url_for('login_page'))
     user_id = session['user_id']
-    comment_counts_query = db.session.query(YoutubeComment.shorts_url, func.count(YoutubeComment.comment_id)).group_by(YoutubeComment.shorts_url).all()
-    comment_counts = dict(comment_counts_query)
-    shorts_list = Shorts.query.filter_by(use_yn='Y').all()
-    shorts_data = []
-    for s in shorts_list:
-        shorts_data.append({'seq': s.seq, 'url': s.url, 'channel_name': s.channel_name, 'channel_profile_url': s.channel_profile_url, 'description': s.description, 'video_id': s.url.split('?')[0].split('/shorts/')[-1], 'comment_count': comment_counts.get(s.url, 0)})
-    last_state = UserLastState.query.filter_by(login_id=user_id).first()
-    activities = ShortsActivity.query.filter_by(login_id=user_id).all()
-    activity_map = {a.shorts_url: {'좋아요': a.like, '싫어요': a.dislike, '공유': a.share, '관심없음': a.interest, '채널추천안함': a.recommend, '신고': a.report, '구독': a.subscribe} for a in activities}
-    return render_template('index.html', shorts=shorts_data, user_id=user_id, session_id=session['session_id'], last_watched_url=last_state.last_watched_url if last_state else None, activity_map=activity_map)
+    last_watched_url, activities = get_user_activity(user_id)
+    activity_map = {url: {label: state[column] for label, (column, _) in ACTIVITY_EVENT_COLUMNS.items()} for url, state in activities.items()}
+    start_short = get_shorts_feed()['by_url'].get(last_watched_url)
+    return render_template('index.html', user_id=user_id, session_id=session['session_id'], last_watched_url=last_watched_url, start_seq=start_short['seq'] if start_short else None, activity_map=activity_map)
+
+@app.route('/api/shorts')
+def shorts_feed_api():
+    # seq 기준 커서 페이지네이션. after/before 는 해당 seq 를 제외, start 는 포함해서 이어지는 페이지를 준다.
+    if session.get('user_role') != 'user': return jsonify(error="Not authorized"), 403
+    limit = min(max(request.args.get('limit', SHORTS_PAGE_SIZE, type=int), 1), SHORTS_PAGE_MAX)
+    after, before, start = (request.args.get(k, type=int) for k in ('after', 'before', 'start'))
+    feed = get_shorts_feed()
+    items, seqs = feed['items'], feed['seqs']
+    if before is not None:
+        end = bisect.bisect_left(seqs, before)
+        begin = max(end - limit, 0)
+    else:
+        begin = bisect.bisect_left(seqs, start) if start is not None else bisect.bisect_right(seqs, after) if after is not None else 0
+        end = min(begin + limit, len(items))
+    page = items[begin:end]
+    return jsonify(items=page, prev_cursor=page[0]['seq'] if page and begin > 0 else None, next_cursor=page[-1]['seq'] if page and end < len(items) else None)
+
+# 사용 중인 숏츠 목록과 댓글 수를 프로세스 단위로 캐시한다. 업로드/크롤링 시 비우고, 다른 워커의 변경은 TTL 이 지나면 반영된다.
+_shorts_cache = {'feed': None, 'loaded_at': 0.0}
+_shorts_cache_lock = threading.Lock()
+
+def get_shorts_feed():
+    with _shorts_cache_lock:
+        if _shorts_cache['feed'] is None or time.monotonic() - _shorts_cache['loaded_at'] > SHORTS_CACHE_TTL:
+            comment_counts = dict(db.session.query(YoutubeComment.shorts_url, func.count()).group_by(YoutubeComment.shorts_url).all())
+            items = [{'seq': s.seq, 'url': s.url, 'channel_name': s.channel_name, 'channel_profile_url': s.channel_profile_url, 'description': s.description, 'video_id': s.url.split('?')[0].split('/shorts/')[-1], 'comment_count': comment_counts.get(s.url, 0)} for s in Shorts.query.filter_by(use_yn='Y').order_by(Shorts.seq).all()]
+            _shorts_cache['feed'] = {'items': items, 'seqs': [i['seq'] for i in items], 'by_url': {i['url']: i for i in items}}
+            _shorts_cache['loaded_at'] = time.monotonic()
+        return _shorts_cache['feed']
+
+def invalidate_shorts_cache():
+    with _shorts_cache_lock:
+        _shorts_cache['feed'] = None
+
+def bump_comment_count(shorts_url):
+    # 댓글 하나 추가로 전체 목록을 다시 읽지 않도록 캐시된 개수만 올린다.
+    with _shorts_cache_lock:
+        item = _shorts_cache['feed'] and _shorts_cache['feed']['by_url'].get(shorts_url)
+        if item: item['comment_count'] += 1
 
 @app.route('/log_event', methods=['POST'])
 def log_event_from_js():
@@ -140,50 +585,332 @@ def log_event_from_js():
     log_and_update_state(login_id=data['login_id'], shorts_url=data['shorts_url'], event_type=data['event_type'], session_id=data['session_id'])
     return jsonify(success=True)
 
+@app.route('/log_events', methods=['POST'])
+def log_events_from_js():
+    # 클라이언트가 모아 보낸 이벤트 배열. age_ms(버퍼에 머문 시간)로 서버 시각 기준 발생 시각을 복원한다.
+    data = request.get_json(silent=True) or {}
+    login_id, session_id, raw_events = data.get('login_id'), data.get('session_id'), data.get('events')
+    if not valid_event_field(login_id, 'login_id') or not valid_event_field(session_id, 'session_id') or not isinstance(raw_events, list): return jsonify(success=False, error="Invalid payload"), 400
+    if len(raw_events) > EVENT_BATCH_MAX_EVENTS: return jsonify(success=False, error="Too many events"), 413
+    now = datetime.now(KST)
+    events = []
+    try:
+        for e in raw_events:
+            if not valid_event_field(e.get('shorts_url'), 'shorts_url') or not valid_event_field(e.get('event_type'), 'event_type'): raise ValueError
+            age_ms = min(max(int(e.get('age_ms') or 0), 0), EVENT_MAX_AGE_MS)
+            events.append((login_id, e['shorts_url'], e['event_type'], session_id, now - timedelta(milliseconds=age_ms)))
+    except (AttributeError, TypeError, ValueError, OverflowError):
+        return jsonify(success=False, error="Invalid event"), 400
+    if events and not enqueue_events(events): return jsonify(success=False, error="Event queue is full"), 503
+    return jsonify(success=True, accepted=len(events))
+
+def valid_event_field(value, column):
+    # 응답 후 writer 에서 실패하면 클라이언트가 다시 보내지 않으므로, event_log 컬럼에 못 들어갈 값은 여기서 400 으로 거른다
+    return isinstance(value, str) and 0 < len(value) <= EventLog.__table__.c[column].type.length
+
 def log_and_update_state(login_id, shorts_url, event_type, session_id):
-    timestamp = datetime.now(KST).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-    db.session.add(EventLog(login_id=login_id, shorts_url=shorts_url, event_timestamp=timestamp, event_type=event_type, session_id=session_id))
-    if event_type not in ['로그인', '시청시작', '시청중지_종료', '댓글클릭', '댓글닫기클릭']:
-        activity = ShortsActivity.query.filter_by(login_id=login_id, shorts_url=shorts_url).first()
-        if not activity:
-            activity = ShortsActivity(login_id=login_id, shorts_url=shorts_url)
-            db.session.add(activity)
-        is_cancel = '취소' in event_type
-        state_value = 0 if is_cancel else 1
-        if '좋아요' in event_type:
-            activity.like = state_value
-            if not is_cancel: activity.dislike = 0
-        elif '싫어요' in event_type:
-            activity.dislike = state_value
-            if not is_cancel: activity.like = 0
-        elif '공유' in event_type: activity.share = state_value
-        elif '관심없음' in event_type: activity.interest = state_value
-        elif '채널추천안함' in event_type: activity.recommend = state_value
-        elif '신고' in event_type: activity.report = state_value
-        elif '구독' in event_type: activity.subscribe = state_value
-    if event_type == '시청시작':
-        last_state = UserLastState.query.filter_by(login_id=login_id).first()
-        if not last_state:
-            last_state = UserLastState(login_id=login_id)
-            db.session.add(last_state)
-        last_state.last_watched_url = shorts_url
+    apply_events([(login_id, shorts_url, event_type, session_id, datetime.now(KST))])
+
+def apply_events(events):
+    """(login_id, shorts_url, event_type, session_id, timestamp) 목록을 순서대로 한 트랜잭션에 반영합니다."""
+    # 활동 상태와 마지막 시청 영상은 값을 덮어쓰기만 하므로 묶음 안에서 순서대로 접은 뒤 upsert 로 한 번에 쓴다.
+    # 워커마다 writer 가 따로 있어 같은 사용자의 묶음이 보낸 순서와 다르게 커밋될 수 있으므로, 상태는 도착 순서가 아니라 이벤트 시각 순서로 정한다.
+    activities, last_watched, pair_events = {}, {}, {}
+    for login_id, shorts_url, event_type, session_id, timestamp in events:
+        db.session.add(EventLog(login_id=login_id, shorts_url=shorts_url, event_timestamp=timestamp, event_type=event_type, session_id=session_id))
+        ts = to_kst_naive(timestamp)
+        pair_events.setdefault((login_id, shorts_url), []).append((ts, event_type))
+        if event_type == '시청시작' and (login_id not in last_watched or ts >= last_watched[login_id][0]): last_watched[login_id] = (ts, shorts_url)
+    # 원본을 먼저 써서 (SQLite 는 여기서 쓰기 잠금을 잡음) 아래 집계 읽기가 최신 상태를 보게 하고, 집계 행은 쌍 순서대로 잠가 교착을 피한다.
+    db.session.flush()
+    for login_id, shorts_url in sorted(pair_events):
+        updates = sorted(pair_events[(login_id, shorts_url)], key=lambda e: e[0])
+        if shorts_url != 'N/A':
+            aggregate = _get_or_create_measurement(login_id, shorts_url)
+            if aggregate.last_event_at is not None and updates[0][0] < aggregate.last_event_at:
+                replay_measurement(aggregate)
+                # 이미 커밋된 더 나중의 활동 이벤트까지 시각 순으로 다시 접어야 늦게 온 이벤트가 최신 상태를 덮지 않는다
+                updates = activity_events_since(login_id, shorts_url, updates[0][0])
+            else:
+                for ts, event_type in updates: update_measurement(aggregate, event_type, ts)
+                aggregate.last_event_at = updates[-1][0]
+        for ts, event_type in updates:
+            if event_type not in NON_ACTIVITY_EVENTS: activities.setdefault((login_id, shorts_url), {}).update(activity_changes(event_type))
+    upsert_activities(activities)
+    upsert_user_state(last_watched, {login_id for login_id, _ in activities})
+    with span('events.commit'):
+        db.session.commit()
+
+def activity_events_since(login_id, shorts_url, since):
+    # 이 트랜잭션에서 flush 한 묶음을 포함해, since 이후 이 쌍의 활동 이벤트를 (시각, 종류) 시간순으로
+    E = EventLog
+    rows = db.session.execute(select(E.event_timestamp, E.event_type).where(E.login_id == login_id, E.shorts_url == shorts_url, E.event_timestamp >= as_kst(since), E.event_type.notin_(NON_ACTIVITY_EVENTS)).order_by(E.event_timestamp, E.id))
+    return [(to_kst_naive(ts), event_type) for ts, event_type in rows]
+
+def activity_changes(event_type):
+    # 활동 이벤트가 바꾸는 {컬럼: 값}. 표에 없는 이벤트는 빈 dict (shorts_activity 행만 생긴다)
+    is_cancel = event_type.endswith('취소')
+    column, opposite = ACTIVITY_EVENT_COLUMNS.get(event_type[:-len('취소')] if is_cancel else event_type, (None, None))
+    if column is None: return {}
+    if is_cancel: return {column: 0}
+    return {column: 1, opposite: 0} if opposite else {column: 1}
+
+def dialect_insert(table):
+    # ON CONFLICT 를 지원하는 방언별 insert. 이벤트 적재와 엑셀 업로드(upsert)가 함께 쓴다.
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_specific_insert
+    elif db.engine.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_specific_insert
+    else:
+        raise NotImplementedError(f"{db.engine.dialect.name} 에서는 INSERT ... ON CONFLICT(upsert)를 지원하지 않습니다. PostgreSQL 또는 SQLite 를 사용하세요.")
+    return dialect_specific_insert(table)
+
+def upsert_activities(activities):
+    # 바뀐 컬럼 조합이 같은 쌍끼리 INSERT ... ON CONFLICT DO UPDATE 한 번(executemany)으로 쓴다.
+    # 처음 보는 쌍은 나머지 컬럼이 기본값(0)인 행으로 생기고, 동시에 들어온 첫 이벤트끼리도 유니크 위반 없이 합쳐진다.
+    by_columns = {}
+    for (login_id, shorts_url), changes in activities.items():
+        by_columns.setdefault(tuple(sorted(changes)), []).append({'login_id': login_id, 'shorts_url': shorts_url, **changes})
+    for columns, rows in by_columns.items():
+        stmt = dialect_insert(ShortsActivity.__table__)
+        if columns: stmt = stmt.on_conflict_do_update(index_elements=['login_id', 'shorts_url'], set_={c: stmt.excluded[c] for c in columns})
+        else: stmt = stmt.on_conflict_do_nothing(index_elements=['login_id', 'shorts_url'])
+        db.session.execute(stmt, rows)
+
+def upsert_user_state(last_watched, login_ids):
+    # last_watched: {login_id: (시청시작 시각, url)}. 이미 더 나중의 시청시작이 커밋돼 있으면 마지막 시청 영상은 그대로 둔다.
+    # 그 뒤 활동이 바뀐 사용자까지 activity_version 을 새 값으로 바꾼다. 같은 트랜잭션이라 버전과 데이터가 함께 커밋된다.
+    table = UserLastState.__table__
+    stmt = dialect_insert(table)
+    if last_watched:
+        watched = stmt.on_conflict_do_update(index_elements=['login_id'], set_={'last_watched_url': stmt.excluded.last_watched_url, 'last_watched_at': stmt.excluded.last_watched_at}, where=or_(table.c.last_watched_at.is_(None), table.c.last_watched_at <= stmt.excluded.last_watched_at))
+        db.session.execute(watched, [{'login_id': login_id, 'last_watched_url': url, 'last_watched_at': ts} for login_id, (ts, url) in last_watched.items()])
+    touched = sorted(set(login_ids) | last_watched.keys())
+    if touched:
+        bumped = stmt.on_conflict_do_update(index_elements=['login_id'], set_={'activity_version': stmt.excluded.activity_version})
+        db.session.execute(bumped, [{'login_id': login_id, 'activity_version': uuid.uuid4().hex} for login_id in touched])
+
+def _get_or_create_measurement(login_id, shorts_url):
+    # 집계 행을 커밋까지 잠근다 (PostgreSQL FOR UPDATE). 다른 워커의 같은 쌍 갱신은 기다렸다가 그 결과 위에 더한다.
+    locked = MeasurementAggregate.query.filter_by(login_id=login_id, shorts_url=shorts_url).with_for_update()
+    aggregate = locked.first()
+    if not aggregate:
+        # 다른 워커가 같은 쌍을 먼저 만들었으면 그 행을 이어서 쓴다 (유니크 위반으로 이벤트 묶음이 버려지지 않도록)
+        db.session.execute(dialect_insert(MeasurementAggregate.__table__).values(login_id=login_id, shorts_url=shorts_url, watch_seconds=0.0, comment_seconds=0.0, commented=0).on_conflict_do_nothing(index_elements=['login_id', 'shorts_url']))
+        aggregate = locked.first()
+    return aggregate
+
+def replay_measurement(aggregate):
+    # 이미 반영한 것보다 이른 이벤트가 늦게 오면(클라이언트 재전송 등) 순서 가정이 깨지므로, 이 쌍만 요약 + 원본을 시간순으로 다시 읽어 계산한다.
+    R, E = EventRollup, EventLog
+    for field in ('first_start_at', 'last_like_at', 'last_dislike_at', 'open_watch_start', 'open_comment_start', 'last_event_at'): setattr(aggregate, field, None)
+    aggregate.watch_seconds = aggregate.comment_seconds = 0.0
+    for r in db.session.execute(select(R.__table__).where(R.login_id == aggregate.login_id, R.shorts_url == aggregate.shorts_url).order_by(R.day)):
+        fold_rollup(aggregate, r)
+    boundary = compacted_until()
+    events_q = select(E.event_type, E.event_timestamp).where(E.login_id == aggregate.login_id, E.shorts_url == aggregate.shorts_url).order_by(E.event_timestamp, E.id)
+    if boundary is not None: events_q = events_q.where(E.event_timestamp >= as_kst(boundary))
+    for event_type, event_timestamp in db.session.execute(events_q):
+        aggregate.last_event_at = to_kst_naive(event_timestamp)
+        update_measurement(aggregate, event_type, aggregate.last_event_at)
+    metrics.inc('measurement_replays_total')
+
+# 사용자별 마지막 시청 영상과 숏츠별 활동 상태를 LRU 로 캐시한다. 요청마다 user_last_state 의 activity_version 을 PK 로 한 번 읽어
+# 캐시에 넣을 때의 값과 다르면 다시 읽으므로, 다른 워커가 적재한 이벤트도 바로 보인다. 아낄 수 있는 것은 shorts_activity 조회뿐이다.
+# activity_version 을 거치지 않고 두 테이블을 직접 고치면 (DB 콘솔 등) 그 사용자의 캐시는 다음 변경이나 재시작까지 옛 값을 줄 수 있다.
+_activity_cache = OrderedDict()
+_activity_cache_lock = threading.Lock()
+
+def get_user_activity(login_id):
+    """(마지막 시청 url, {shorts_url: {활동 컬럼: 값}}) 을 돌려줍니다. 돌려준 dict 는 고치지 않습니다."""
+    last_state = db.session.execute(select(UserLastState.last_watched_url, UserLastState.activity_version).where(UserLastState.login_id == login_id)).first()
+    last_watched_url, version = last_state if last_state else (None, None)
+    with _activity_cache_lock:
+        entry = _activity_cache.get(login_id)
+        if entry and entry['version'] == version:
+            _activity_cache.move_to_end(login_id)
+            return entry['last_watched_url'], entry['activities']
+    # 버전을 읽은 뒤 커밋된 활동이 섞여 읽혀도 다음 요청에서는 버전이 달라 다시 읽는다
+    activities = {a.shorts_url: {c: getattr(a, c) or 0 for c in ACTIVITY_COLUMNS} for a in ShortsActivity.query.filter_by(login_id=login_id)}
+    with _activity_cache_lock:
+        _activity_cache[login_id] = {'version': version, 'last_watched_url': last_watched_url, 'activities': activities}
+        _activity_cache.move_to_end(login_id)
+        while len(_activity_cache) > ACTIVITY_CACHE_SIZE: _activity_cache.popitem(last=False)
+    return last_watched_url, activities
+
+def invalidate_activity_cache():
+    # 테이블을 통째로 비운 경우: 남은 사용자의 버전을 모두 바꿔 다른 워커의 캐시도 다시 읽게 한다
+    db.session.execute(update(UserLastState).values(activity_version=uuid.uuid4().hex))
     db.session.commit()
+    with _activity_cache_lock:
+        _activity_cache.clear()
+
+def update_measurement(aggregate, event_type, ts):
+    # generate_measurement_results 의 구간 계산과 같은 규칙: 첫 시작이 구간을 열고, 짝이 되는 종료가 닫으며, 열린 동안의 반복 시작은 무시
+    # 시간순으로 들어온다고 가정한다. 순서가 어긋난 이벤트는 apply_events 가 replay_measurement 로 돌린다.
+    if event_type == '시청시작':
+        if aggregate.first_start_at is None or ts < aggregate.first_start_at: aggregate.first_start_at = ts
+        if aggregate.open_watch_start is None: aggregate.open_watch_start = ts
+    elif event_type == '시청중지_종료':
+        if aggregate.open_watch_start is not None:
+            aggregate.watch_seconds += (ts - aggregate.open_watch_start).total_seconds()
+            aggregate.open_watch_start = None
+    elif event_type == '댓글클릭':
+        if aggregate.open_comment_start is None: aggregate.open_comment_start = ts
+    elif event_type == '댓글닫기클릭':
+        if aggregate.open_comment_start is not None:
+            aggregate.comment_seconds += (ts - aggregate.open_comment_start).total_seconds()
+            aggregate.open_comment_start = None
+    elif event_type == '좋아요':
+        if aggregate.last_like_at is None or ts > aggregate.last_like_at: aggregate.last_like_at = ts
+    elif event_type == '싫어요':
+        if aggregate.last_dislike_at is None or ts > aggregate.last_dislike_at: aggregate.last_dislike_at = ts
+
+# 요청 스레드는 큐에 넣기만 하고, 워커 프로세스당 하나의 writer 스레드가 여러 요청의 배치를 모아 한 번에 커밋한다.
+# writer가 하나이므로 같은 세션의 이벤트는 들어온 순서대로 기록된다.
+_event_queue = queue.Queue(maxsize=EVENT_QUEUE_MAXSIZE)
+_event_writer = None
+_event_writer_lock = threading.Lock()
+
+def enqueue_events(events):
+    if not EVENT_WRITE_BEHIND:
+        apply_events(events)
+        return True
+    _ensure_event_writer()
+    try:
+        _event_queue.put(events, timeout=EVENT_QUEUE_PUT_TIMEOUT)
+    except queue.Full:
+        return False
+    return True
+
+def _ensure_event_writer():
+    global _event_writer
+    if _event_writer is not None and _event_writer.is_alive(): return
+    with _event_writer_lock:
+        if _event_writer is None or not _event_writer.is_alive():
+            _event_writer = threading.Thread(target=_event_writer_loop, name='event-writer', daemon=True)
+            _event_writer.start()
+
+def _event_writer_loop():
+    stop = False
+    while not stop:
+        batches = [_event_queue.get()]
+        total = len(batches[0] or [])
+        while total < EVENT_BATCH_MAX_EVENTS:
+            try:
+                batches.append(_event_queue.get_nowait())
+            except queue.Empty:
+                break
+            total += len(batches[-1] or [])
+        if None in batches:
+            stop = True
+            batches = [b for b in batches if b is not None]
+        if batches: _write_event_batches(batches)
+
+def _write_event_batches(batches):
+    with app.app_context():
+        try:
+            apply_events_with_retry([e for batch in batches for e in batch])
+        except Exception:
+            db.session.rollback()
+            # 묶음 전체가 실패하면 요청 단위로 다시 시도해서 문제 있는 배치만 버린다.
+            for batch in batches:
+                try:
+                    apply_events_with_retry(batch)
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("이벤트 배치 기록 실패 (%d건 폐기)", len(batch))
+
+def is_transient_db_error(exc):
+    # 잠금 대기 초과(SQLite database is locked, PostgreSQL lock_timeout)와 끊긴 연결은 같은 배치를 다시 쓰면 성공할 수 있다
+    return isinstance(exc, DBAPIError) and (exc.connection_invalidated or isinstance(exc, OperationalError))
+
+def apply_events_with_retry(events):
+    # 이미 응답한 이벤트이므로 일시적 오류로는 버리지 않고 지수 백오프로 다시 쓴다. 그동안 큐가 차면 새 요청은 503 을 받아 클라이언트가 재전송한다.
+    for attempt in range(EVENT_WRITE_RETRIES + 1):
+        try:
+            return apply_events(events)
+        except DBAPIError as e:
+            db.session.rollback()
+            if not is_transient_db_error(e) or attempt == EVENT_WRITE_RETRIES: raise
+            metrics.inc('event_write_retries_total')
+            app.logger.warning("이벤트 배치 기록 재시도 %d/%d (%d건): %s", attempt + 1, EVENT_WRITE_RETRIES, len(events), e.orig)
+        time.sleep(min(2 ** attempt * 0.5, EVENT_WRITE_RETRY_MAX_DELAY) + random.random() * 0.1)
+
+@atexit.register
+def flush_event_queue(timeout=10):
+    if _event_writer is None or not _event_writer.is_alive(): return
+    _event_queue.put(None)
+    _event_writer.join(timeout)
 
 @app.route('/get_comments')
 def get_comments():
+    # 최상위 댓글을 cursor(순번) 단위로 나눠 주고, parent_id 가 있으면 그 댓글의 답글을 같은 방식으로 준다.
     if session.get('user_role') != 'user': return jsonify(error="Not authorized"), 403
     shorts_url = request.args.get('url')
+    parent_id = request.args.get('parent_id')
+    cursor = max(request.args.get('cursor', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', COMMENT_PAGE_SIZE, type=int), 1), COMMENT_PAGE_MAX)
+    etag = comment_etag(shorts_url)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        tree = get_comment_tree(shorts_url, etag)
+        comments = tree['replies'].get(parent_id, []) if parent_id else tree['threads']
+        page = comments[cursor:cursor + limit]
+        next_cursor = cursor + limit if cursor + limit < len(comments) else None
+        response = jsonify(comments=page, next_cursor=next_cursor, total=tree['total'])
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# shorts_url 별 댓글 트리를 LRU 로 캐시한다. 버전(ETag)은 DB 의 댓글 수와 최대 seq 로 정하므로 어느 워커에서 받아도 같고,
+# 다른 워커가 댓글을 추가/교체하면 다음 요청의 버전이 달라져 다시 읽는다.
+_comment_cache = OrderedDict()
+_comment_cache_lock = threading.Lock()
+
+def comment_etag(shorts_url):
+    # 댓글은 추가(새 seq), 크롤링 교체(삭제 후 새 seq), 초기화(0개)로만 바뀐다.
+    count, last_seq = db.session.query(func.count(), func.max(YoutubeComment.seq)).filter(YoutubeComment.shorts_url == shorts_url).one()
+    return f"c{count}-{last_seq or 0}"
+
+def get_comment_tree(shorts_url, etag=None):
+    etag = etag or comment_etag(shorts_url)
+    with _comment_cache_lock:
+        tree = _comment_cache.get(shorts_url)
+        if tree and tree['etag'] == etag:
+            _comment_cache.move_to_end(shorts_url)
+            return tree
+    # 버전을 읽은 뒤 추가된 댓글이 트리에 섞여도, 다음 요청에서 버전이 달라 다시 읽으므로 오래된 트리가 남지 않는다.
+    tree = _load_comment_tree(shorts_url)
+    tree['etag'] = etag
+    with _comment_cache_lock:
+        _comment_cache[shorts_url] = tree
+        _comment_cache.move_to_end(shorts_url)
+        while len(_comment_cache) > COMMENT_CACHE_SIZE: _comment_cache.popitem(last=False)
+    return tree
+
+def _load_comment_tree(shorts_url):
     comments = YoutubeComment.query.filter_by(shorts_url=shorts_url).order_by(YoutubeComment.published_at).all()
-    comments_dict = {c.comment_id: {"shorts_url": c.shorts_url, "comment_id": c.comment_id, "parent_id": c.parent_id, "author_name": c.author_name, "comment_text": c.comment_text, "published_at": c.published_at, "like_count": c.like_count, "author_profile_image_url": c.author_profile_image_url, "replies": []} for c in comments}
-    nested_comments = []
+    comments_dict = {c.comment_id: {"shorts_url": c.shorts_url, "comment_id": c.comment_id, "parent_id": c.parent_id, "author_name": c.author_name, "comment_text": c.comment_text, "published_at": as_kst(c.published_at).isoformat() if c.published_at else None, "like_count": c.like_count, "author_profile_image_url": c.author_profile_image_url, "reply_count": 0} for c in comments}
+    threads, replies, total = [], {}, 0
     for comment in comments:
         if comment.parent_id:
             parent = comments_dict.get(comment.parent_id)
             if parent:
-                parent['replies'].append(comments_dict[comment.comment_id])
+                replies.setdefault(comment.parent_id, []).append(comments_dict[comment.comment_id])
+                parent['reply_count'] += 1
+                total += 1
         else:
-            nested_comments.append(comments_dict[comment.comment_id])
-    return jsonify(nested_comments)
+            threads.append(comments_dict[comment.comment_id])
+            total += 1
+    return {'threads': threads, 'replies': replies, 'total': total}
+
+def invalidate_comment_cache(shorts_url=None):
+    # 버전은 요청마다 DB 에서 확인하므로, 이 프로세스에서 바뀐 트리를 메모리에서 바로 내려놓는 용도다.
+    with _comment_cache_lock:
+        if shorts_url is None: _comment_cache.clear()
+        else: _comment_cache.pop(shorts_url, None)
 
 @app.route('/add_comment', methods=['POST'])
 def add_comment():
@@ -194,94 +921,262 @@ def add_comment():
     parent_id = data.get('parent_id')
     user_id = session.get('user_id')
     if not all([shorts_url, comment_text, user_id]): return jsonify(error="Missing data"), 400
-    new_comment = YoutubeComment(shorts_url=shorts_url, comment_id=f"user_comment_{uuid.uuid4()}", parent_id=parent_id, author_name=user_id, comment_text=comment_text, published_at=datetime.now(KST).isoformat(), like_count=0, author_profile_image_url=f"https://i.pravatar.cc/32?u={user_id}")
+    new_comment = YoutubeComment(shorts_url=shorts_url, comment_id=f"user_comment_{uuid.uuid4()}", parent_id=parent_id, author_name=user_id, comment_text=comment_text, published_at=datetime.now(KST), like_count=0, author_profile_image_url=f"https://i.pravatar.cc/32?u={user_id}")
     db.session.add(new_comment)
+    _get_or_create_measurement(user_id, shorts_url).commented = 1
     db.session.commit()
-    return jsonify({"comment_id": new_comment.comment_id, "parent_id": new_comment.parent_id, "author_name": new_comment.author_name, "comment_text": new_comment.comment_text, "published_at": new_comment.published_at, "like_count": new_comment.like_count, "author_profile_image_url": new_comment.author_profile_image_url})
+    bump_comment_count(shorts_url)
+    invalidate_comment_cache(shorts_url)
+    return jsonify({"comment_id": new_comment.comment_id, "parent_id": new_comment.parent_id, "author_name": new_comment.author_name, "comment_text": new_comment.comment_text, "published_at": as_kst(new_comment.published_at).isoformat(), "like_count": new_comment.like_count, "author_profile_image_url": new_comment.author_profile_image_url})
 
 # --- 관리자 페이지 ---
-def generate_measurement_results(search_login_id, search_shorts_url):
-    logs_q = db.session.query(EventLog).statement
-    activities_q = db.session.query(ShortsActivity).statement
-    user_comments_q = db.session.query(YoutubeComment).filter(YoutubeComment.comment_id.like('user_comment_%')).statement
-    logs = pd.read_sql(logs_q, db.engine)
-    activities = pd.read_sql(activities_q, db.engine)
-    user_comments = pd.read_sql(user_comments_q, db.engine)
-    if not logs.empty: logs = logs[logs['shorts_url'] != 'N/A']
+def generate_measurement_results(search_login_id, search_shorts_url, date_from=None, date_to=None):
+    # 요약이 끝난 날짜는 event_rollup 을, 그 이후는 원본 event_log 를 읽는다.
+    # 쌍별 계산은 그 쌍의 행만 보므로 검색 조건과 기간(KST 날짜, 양 끝 포함)은 SQL 에서 먼저 걸러도 결과가 같다.
+    import pandas as pd
+    lo = kst_midnight(date_from) if date_from else None
+    hi = kst_midnight(date_to + timedelta(days=1)) if date_to else None
+    # 요약 경계와 데이터는 같은 연결(복제본이면 복제본)에서 읽어야 요약/원본이 어긋나지 않는다.
+    with span('measurement.read_sql'), read_engine().connect() as conn:
+        boundary = compacted_until(conn)
+        logs_q = select(EventLog.__table__).where(EventLog.shorts_url != 'N/A', *search_conditions(EventLog.login_id, EventLog.shorts_url, search_login_id, search_shorts_url))
+        if boundary is not None: logs_q = logs_q.where(EventLog.event_timestamp >= as_kst(boundary))
+        if lo is not None: logs_q = logs_q.where(EventLog.event_timestamp >= lo)
+        if hi is not None: logs_q = logs_q.where(EventLog.event_timestamp < hi)
+        logs = pd.read_sql(logs_q, conn)
+        rollups = read_rollups(conn, search_login_id, search_shorts_url, date_from, date_to)
+        activities = pd.read_sql(select(ShortsActivity.__table__).where(*search_conditions(ShortsActivity.login_id, ShortsActivity.shorts_url, search_login_id, search_shorts_url)), conn)
+        comments_q = select(YoutubeComment.__table__).where(YoutubeComment.comment_id.like('user_comment_%'), *search_conditions(YoutubeComment.author_name, YoutubeComment.shorts_url, search_login_id, search_shorts_url))
+        if lo is not None: comments_q = comments_q.where(YoutubeComment.published_at >= lo)
+        if hi is not None: comments_q = comments_q.where(YoutubeComment.published_at < hi)
+        user_comments = pd.read_sql(comments_q, conn)
     all_pairs = []
     if not logs.empty: all_pairs.append(logs[['login_id', 'shorts_url']].drop_duplicates())
-    if not activities.empty: all_pairs.append(activities[['login_id', 'shorts_url']].drop_duplicates())
+    if not rollups.empty: all_pairs.append(rollups[['login_id', 'shorts_url']].drop_duplicates())
+    # 활동 상태는 날짜가 없으므로 기간 검색에서는 행을 만들지 않고 기간 안에 나타난 쌍에 붙이기만 한다.
+    if not activities.empty and lo is None and hi is None: all_pairs.append(activities[['login_id', 'shorts_url']].drop_duplicates())
     if not user_comments.empty:
         user_comments.rename(columns={'author_name': 'login_id'}, inplace=True)
         all_pairs.append(user_comments[['login_id', 'shorts_url']].drop_duplicates())
     if not all_pairs: return [], []
     base_df = pd.concat(all_pairs, ignore_index=True).drop_duplicates()
-    if not logs.empty:
-        logs['event_timestamp'] = pd.to_datetime(logs['event_timestamp'], errors='coerce')
-        first_starts = logs[logs['event_type'] == '시청시작'].groupby(['login_id', 'shorts_url'])['event_timestamp'].min().reset_index()
-        first_starts.rename(columns={'event_timestamp': 'start_time'}, inplace=True)
-        last_likes = logs[logs['event_type'] == '좋아요'].groupby(['login_id', 'shorts_url'])['event_timestamp'].max().reset_index()
-        last_likes.rename(columns={'event_timestamp': 'like_time'}, inplace=True)
-        last_dislikes = logs[logs['event_type'] == '싫어요'].groupby(['login_id', 'shorts_url'])['event_timestamp'].max().reset_index()
-        last_dislikes.rename(columns={'event_timestamp': 'dislike_time'}, inplace=True)
-        time_to_action = pd.merge(first_starts, last_likes, on=['login_id', 'shorts_url'], how='left')
-        time_to_action = pd.merge(time_to_action, last_dislikes, on=['login_id', 'shorts_url'], how='left')
-        time_to_action['time_to_like'] = (time_to_action['like_time'] - time_to_action['start_time']).dt.total_seconds().round(1)
-        time_to_action['time_to_dislike'] = (time_to_action['dislike_time'] - time_to_action['start_time']).dt.total_seconds().round(1)
-    else:
-        time_to_action = pd.DataFrame(columns=['login_id', 'shorts_url', 'time_to_like', 'time_to_dislike'])
-    def calculate_sequential_duration(group_df, start_event, end_event):
-        total_duration = 0
-        start_time = None
-        for _, row in group_df.iterrows():
-            if row['event_type'] == start_event:
-                if start_time is None: start_time = row['event_timestamp']
-            elif row['event_type'] == end_event:
-                if start_time is not None:
-                    duration = (row['event_timestamp'] - start_time).total_seconds()
-                    total_duration += duration
-                    start_time = None
-        return total_duration
-    watch_durations, comment_durations = pd.DataFrame(), pd.DataFrame()
-    if not logs.empty:
-        logs_sorted = logs.sort_values(by=['login_id', 'shorts_url', 'event_timestamp'])
-        view_logs = logs_sorted[logs_sorted['event_type'].isin(['시청시작', '시청중지_종료'])]
-        agg_watch = view_logs.groupby(['login_id', 'shorts_url']).apply(calculate_sequential_duration, '시청시작', '시청중지_종료')
-        watch_durations = pd.DataFrame(agg_watch, columns=['duration']).reset_index()
-        comment_logs = logs_sorted[logs_sorted['event_type'].isin(['댓글클릭', '댓글닫기클릭'])]
-        agg_comment = comment_logs.groupby(['login_id', 'shorts_url']).apply(calculate_sequential_duration, '댓글클릭', '댓글닫기클릭')
-        comment_durations = pd.DataFrame(agg_comment, columns=['duration']).reset_index()
-    if not user_comments.empty:
-        user_comments_agg = user_comments[['login_id', 'shorts_url']].assign(댓글작성=1).drop_duplicates()
-    else:
-        user_comments_agg = pd.DataFrame(columns=['login_id', 'shorts_url', '댓글작성'])
-    result_df = base_df.copy()
-    if not activities.empty: result_df = pd.merge(result_df, activities, on=['login_id', 'shorts_url'], how='left')
-    if not watch_durations.empty: result_df = pd.merge(result_df, watch_durations, on=['login_id', 'shorts_url'], how='left')
-    if not comment_durations.empty: result_df = pd.merge(result_df, comment_durations, on=['login_id', 'shorts_url'], how='left', suffixes=('_watch', '_comment'))
-    if not user_comments_agg.empty: result_df = pd.merge(result_df, user_comments_agg, on=['login_id', 'shorts_url'], how='left')
-    if not time_to_action.empty: result_df = pd.merge(result_df, time_to_action[['login_id', 'shorts_url', 'time_to_like', 'time_to_dislike']], on=['login_id', 'shorts_url'], how='left')
-    result_df.rename(columns={'duration_watch': '시청시간(S)', 'duration': '시청시간(S)', 'duration_comment': '댓글시간(S)', 'like': '좋아요', 'dislike': '싫어요', 'share': '공유', 'interest': '관심없음', 'recommend': '채널추천안함', 'report': '신고'}, inplace=True)
-    if 'duration' in result_df.columns and '시청시간(S)' not in result_df.columns: result_df.rename(columns={'duration': '시청시간(S)'}, inplace=True)
-    final_columns = ['login_id', 'shorts_url', '시청시간(S)', '좋아요', '싫어요', '댓글시간(S)', '댓글작성', '공유', '관심없음', '채널추천안함', '신고']
-    for col in final_columns:
-        if col not in result_df.columns: result_df[col] = 0
-    result_df.fillna(0, inplace=True)
-    if '시청시간(S)' in result_df.columns: result_df['시청시간(S)'] = result_df['시청시간(S)'].round(1)
-    if '댓글시간(S)' in result_df.columns: result_df['댓글시간(S)'] = result_df['댓글시간(S)'].round(1)
-    def format_action(row, action_col, time_col):
-        state = row[action_col]
-        time = row.get(time_col, 0)
-        if state == 1 and time > 0:
-            return f"1({time})"
-        return str(int(state))
-    result_df['좋아요'] = result_df.apply(lambda row: format_action(row, '좋아요', 'time_to_like'), axis=1)
-    result_df['싫어요'] = result_df.apply(lambda row: format_action(row, '싫어요', 'time_to_dislike'), axis=1)
-    if search_login_id: result_df = result_df[result_df['login_id'].str.contains(search_login_id, na=False)]
-    if search_shorts_url: result_df = result_df[result_df['shorts_url'].str.contains(search_shorts_url, na=False)]
-    result_df = result_df[final_columns]
+    with span('measurement.time_to_action'):
+        if not logs.empty: logs['event_timestamp'] = kst_naive_series(logs['event_timestamp'])
+        # 검색/기간으로 한쪽이 비는 경우가 많으므로 빈 프레임은 빼고 잇는다 (빈 프레임이 섞이면 시각 컬럼 dtype 이 흔들림)
+        frames = [f for f in ([logs[['login_id', 'shorts_url', 'event_type', 'event_timestamp']], rollup_stamps(rollups)] if not rollups.empty else [logs]) if not f.empty]
+        stamps = pd.concat(frames, ignore_index=True) if frames else logs
+        if not stamps.empty:
+            first_starts = stamps[stamps['event_type'] == '시청시작'].groupby(['login_id', 'shorts_url'])['event_timestamp'].min().reset_index()
+            first_starts.rename(columns={'event_timestamp': 'start_time'}, inplace=True)
+            last_likes = stamps[stamps['event_type'] == '좋아요'].groupby(['login_id', 'shorts_url'])['event_timestamp'].max().reset_index()
+            last_likes.rename(columns={'event_timestamp': 'like_time'}, inplace=True)
+            last_dislikes = stamps[stamps['event_type'] == '싫어요'].groupby(['login_id', 'shorts_url'])['event_timestamp'].max().reset_index()
+            last_dislikes.rename(columns={'event_timestamp': 'dislike_time'}, inplace=True)
+            time_to_action = pd.merge(first_starts, last_likes, on=['login_id', 'shorts_url'], how='left')
+            time_to_action = pd.merge(time_to_action, last_dislikes, on=['login_id', 'shorts_url'], how='left')
+            time_to_action['time_to_like'] = (time_to_action['like_time'] - time_to_action['start_time']).dt.total_seconds().round(1)
+            time_to_action['time_to_dislike'] = (time_to_action['dislike_time'] - time_to_action['start_time']).dt.total_seconds().round(1)
+        else:
+            time_to_action = pd.DataFrame(columns=['login_id', 'shorts_url', 'time_to_like', 'time_to_dislike'])
+    with span('measurement.durations'):
+        watch_durations, comment_durations = pd.DataFrame(), pd.DataFrame()
+        if not logs.empty or not rollups.empty:
+            # 마지막 요약에서 열려 있던 구간은 그 시작 시각의 합성 시작 이벤트로 원본 앞에 이어 붙인다.
+            frames = [f for f in ([rollup_carry_events(rollups), logs] if not rollups.empty else [logs]) if not f.empty]
+            logs_sorted = pd.concat(frames, ignore_index=True) if frames else logs
+            logs_sorted = logs_sorted.sort_values(by=['login_id', 'shorts_url', 'event_timestamp'])
+            watch_durations = add_rollup_seconds(sequential_durations(logs_sorted, '시청시작', '시청중지_종료'), rollups, 'watch_seconds')
+            comment_durations = add_rollup_seconds(sequential_durations(logs_sorted, '댓글클릭', '댓글닫기클릭'), rollups, 'comment_seconds')
+    with span('measurement.merge'):
+        if not user_comments.empty:
+            user_comments_agg = user_comments[['login_id', 'shorts_url']].assign(댓글작성=1).drop_duplicates()
+        else:
+            user_comments_agg = pd.DataFrame(columns=['login_id', 'shorts_url', '댓글작성'])
+        result_df = base_df.copy()
+        if not activities.empty: result_df = pd.merge(result_df, activities, on=['login_id', 'shorts_url'], how='left')
+        if not watch_durations.empty: result_df = pd.merge(result_df, watch_durations, on=['login_id', 'shorts_url'], how='left')
+        if not comment_durations.empty: result_df = pd.merge(result_df, comment_durations, on=['login_id', 'shorts_url'], how='left', suffixes=('_watch', '_comment'))
+        if not user_comments_agg.empty: result_df = pd.merge(result_df, user_comments_agg, on=['login_id', 'shorts_url'], how='left')
+        if not time_to_action.empty: result_df = pd.merge(result_df, time_to_action[['login_id', 'shorts_url', 'time_to_like', 'time_to_dislike']], on=['login_id', 'shorts_url'], how='left')
+        result_df.rename(columns={'duration_watch': '시청시간(S)', 'duration': '시청시간(S)', 'duration_comment': '댓글시간(S)', 'like': '좋아요', 'dislike': '싫어요', 'share': '공유', 'interest': '관심없음', 'recommend': '채널추천안함', 'report': '신고'}, inplace=True)
+        if 'duration' in result_df.columns and '시청시간(S)' not in result_df.columns: result_df.rename(columns={'duration': '시청시간(S)'}, inplace=True)
+        final_columns = list(MEASUREMENT_COLUMNS)
+        for col in final_columns:
+            if col not in result_df.columns: result_df[col] = 0
+        result_df.fillna(0, inplace=True)
+        if '시청시간(S)' in result_df.columns: result_df['시청시간(S)'] = result_df['시청시간(S)'].round(1)
+        if '댓글시간(S)' in result_df.columns: result_df['댓글시간(S)'] = result_df['댓글시간(S)'].round(1)
+        result_df['좋아요'] = format_actions(result_df, '좋아요', 'time_to_like')
+        result_df['싫어요'] = format_actions(result_df, '싫어요', 'time_to_dislike')
+        # SQLite 의 LIKE 는 대소문자를 무시하므로 걸러진 부분집합에 화면과 같은 대소문자 구분 검사를 한 번 더 한다.
+        if search_login_id: result_df = result_df[result_df['login_id'].str.contains(search_login_id, na=False, regex=False)]
+        if search_shorts_url: result_df = result_df[result_df['shorts_url'].str.contains(search_shorts_url, na=False, regex=False)]
+        result_df = result_df[final_columns]
     return result_df.to_dict('records'), final_columns
 
+def read_rollups(connection=None, search_login_id='', search_shorts_url='', date_from=None, date_to=None):
+    import pandas as pd
+    R = EventRollup
+    q = select(R.login_id, R.shorts_url, R.day, R.watch_seconds, R.comment_seconds, R.first_start_at, R.last_like_at, R.last_dislike_at, R.open_watch_start, R.open_comment_start).where(*search_conditions(R.login_id, R.shorts_url, search_login_id, search_shorts_url))
+    if date_from: q = q.where(R.day >= date_from)
+    if date_to: q = q.where(R.day <= date_to)
+    rollups = pd.read_sql(q.order_by(R.login_id, R.shorts_url, R.day), connection if connection is not None else db.engine)
+    for col in ['first_start_at', 'last_like_at', 'last_dislike_at', 'open_watch_start', 'open_comment_start']:
+        rollups[col] = kst_naive_series(rollups[col])
+    return rollups
+
+def rollup_stamps(rollups):
+    # 요약의 첫 시작/마지막 좋아요/마지막 싫어요를 같은 종류의 이벤트처럼 늘어놓아 원본과 함께 min/max 를 구한다.
+    stamp_columns = {'first_start_at': '시청시작', 'last_like_at': '좋아요', 'last_dislike_at': '싫어요'}
+    stamps = rollups.melt(id_vars=['login_id', 'shorts_url'], value_vars=list(stamp_columns), var_name='event_type', value_name='event_timestamp').dropna(subset=['event_timestamp'])
+    stamps['event_type'] = stamps['event_type'].map(stamp_columns)
+    return stamps
+
+def rollup_carry_events(rollups):
+    import pandas as pd
+    last = rollups.groupby(['login_id', 'shorts_url'], sort=False).tail(1)
+    carry = [last.assign(event_type=event_type, event_timestamp=last[col])[['login_id', 'shorts_url', 'event_type', 'event_timestamp']] for col, event_type in [('open_watch_start', '시청시작'), ('open_comment_start', '댓글클릭')]]
+    return pd.concat(carry, ignore_index=True).dropna(subset=['event_timestamp'])
+
+def add_rollup_seconds(durations, rollups, column):
+    import pandas as pd
+    if rollups.empty: return durations
+    totals = rollups.groupby(['login_id', 'shorts_url'], sort=False)[column].sum().reset_index()
+    merged = pd.merge(totals, durations, on=['login_id', 'shorts_url'], how='outer')
+    # 한쪽이 빈 프레임이면 object dtype 이 되므로 숫자로 바꾼 뒤 채운다 (object 의 fillna 는 downcasting FutureWarning)
+    merged['duration'] = pd.to_numeric(merged[column], errors='coerce').fillna(0) + pd.to_numeric(merged['duration'], errors='coerce').fillna(0)
+    return merged[['login_id', 'shorts_url', 'duration']]
+
+def sequential_durations(logs_sorted, start_event, end_event):
+    # (login_id, shorts_url, event_timestamp) 로 정렬된 로그에서 시작~종료 구간 합계를 벡터 연산으로 구한다.
+    # 첫 시작이 구간을 열고, 짝이 되는 종료가 닫으며, 열린 동안의 반복 시작과 열리지 않은 종료는 무시한다.
+    # 즉 종료 행 바로 앞(같은 쌍 안)의 행이 시작일 때만 구간이 닫히고, 그 구간은 연속된 시작 묶음의 첫 행에서 열린 것이다.
+    import numpy as np
+    import pandas as pd
+    pair_logs = logs_sorted[logs_sorted['event_type'].isin([start_event, end_event]) & logs_sorted['event_timestamp'].notna()]
+    if pair_logs.empty: return pd.DataFrame(columns=['login_id', 'shorts_url', 'duration'])
+    groups = pair_logs.groupby(['login_id', 'shorts_url'], sort=False).ngroup().to_numpy()
+    keys = pair_logs[['login_id', 'shorts_url']].drop_duplicates().reset_index(drop=True)
+    is_start = (pair_logs['event_type'] == start_event).to_numpy()
+    ts = pair_logs['event_timestamp'].to_numpy(dtype='datetime64[ns]').view('i8')
+    positions = np.arange(len(pair_logs))
+    group_begin = np.r_[True, groups[1:] != groups[:-1]]
+    run_begin = group_begin | np.r_[True, is_start[1:] != is_start[:-1]]
+    run_first = np.maximum.accumulate(np.where(run_begin, positions, 0))
+    closes = np.flatnonzero(~is_start & ~group_begin & np.r_[False, is_start[:-1]])
+    # Timedelta.total_seconds() 와 같은 float 이 나오도록 (초 정수부 + 마이크로초 / 1e6) 으로 계산한다. 나노초 / 1e9 와는 마지막 자리가 다를 수 있음.
+    delta = ts[closes] - ts[run_first[closes - 1]]
+    seconds = delta // 10**9 + (delta % 10**9 // 1000) / 1e6
+    keys['duration'] = np.bincount(groups[closes], weights=seconds, minlength=len(keys))
+    return keys
+
+def format_actions(result_df, action_col, time_col):
+    # 상태가 1이고 첫 시청시작 이후 걸린 시간이 있으면 "1(초)", 아니면 상태값 문자열
+    import pandas as pd
+    state = result_df[action_col]
+    time = result_df[time_col] if time_col in result_df.columns else pd.Series(0, index=result_df.index)
+    with_time = (state == 1) & (time > 0)
+    formatted = state.astype(int).astype(str)
+    formatted[with_time] = '1(' + time[with_time].astype(str) + ')'
+    return formatted
+
+def get_measurement_results(search_login_id, search_shorts_url, date_from=None, date_to=None):
+    # 누적 집계에는 날짜가 없으므로 기간 검색은 항상 이벤트에서 계산한다.
+    if MEASUREMENT_SOURCE == 'events' or date_from or date_to: return generate_measurement_results(search_login_id, search_shorts_url, date_from, date_to)
+    return read_measurement_aggregates(search_login_id, search_shorts_url)
+
+def read_measurement_aggregates(search_login_id, search_shorts_url):
+    # measurement_aggregate 와 shorts_activity 를 (login_id, shorts_url) 로 합친다. 활동만 있고 집계가 없는 쌍도 포함.
+    M, A = MeasurementAggregate, ShortsActivity
+    on_pair = and_(M.login_id == A.login_id, M.shorts_url == A.shorts_url)
+    with read_session() as reads:
+        agg_q = reads.query(M, A).outerjoin(A, on_pair)
+        act_q = reads.query(A).filter(~exists().where(on_pair))
+        agg_q = agg_q.filter(*search_conditions(M.login_id, M.shorts_url, search_login_id, search_shorts_url))
+        act_q = act_q.filter(*search_conditions(A.login_id, A.shorts_url, search_login_id, search_shorts_url))
+        rows = agg_q.all() + [(None, a) for a in act_q.all()]
+    def format_action(state, action_at, start_at):
+        if state == 1 and action_at is not None and start_at is not None:
+            time = round((action_at - start_at).total_seconds(), 1)
+            if time > 0: return f"1({time})"
+        return str(int(state))
+    data = []
+    for m, a in rows:
+        pair = m or a
+        act = lambda col: (getattr(a, col) or 0) if a else 0
+        data.append({
+            'login_id': pair.login_id, 'shorts_url': pair.shorts_url,
+            '시청시간(S)': round(m.watch_seconds, 1) if m else 0,
+            '좋아요': format_action(act('like'), m.last_like_at if m else None, m.first_start_at if m else None),
+            '싫어요': format_action(act('dislike'), m.last_dislike_at if m else None, m.first_start_at if m else None),
+            '댓글시간(S)': round(m.comment_seconds, 1) if m else 0,
+            '댓글작성': m.commented if m else 0,
+            '공유': act('share'), '관심없음': act('interest'), '채널추천안함': act('recommend'), '신고': act('report'),
+        })
+    data.sort(key=lambda r: (r['login_id'], r['shorts_url']))
+    return data, MEASUREMENT_COLUMNS
+
+def rebuild_measurements(chunk_size=10000):
+    # event_log 를 시간순으로 chunk 단위 스트리밍하며 (login_id, shorts_url)별 집계를 다시 만든다.
+    aggregates = {}
+    def state(login_id, shorts_url):
+        if (login_id, shorts_url) not in aggregates:
+            aggregates[(login_id, shorts_url)] = SimpleNamespace(login_id=login_id, shorts_url=shorts_url, watch_seconds=0.0, comment_seconds=0.0, first_start_at=None, last_like_at=None, last_dislike_at=None, commented=0, open_watch_start=None, open_comment_start=None, last_event_at=None)
+        return aggregates[(login_id, shorts_url)]
+    # 읽는 동안 커밋된 증분이 아래 삭제로 사라지지 않도록 읽기 전에 집계 테이블 쓰기를 막고, 한 트랜잭션으로 지우고 다시 쓴다.
+    # PostgreSQL 은 EXCLUSIVE 잠금(조회는 허용), SQLite 는 먼저 지워서 쓰기 잠금을 잡는다. 그동안 이벤트 적재는 커밋을 기다린다.
+    if db.engine.dialect.name == 'postgresql': db.session.execute(text("LOCK TABLE measurement_aggregate IN EXCLUSIVE MODE"))
+    db.session.query(MeasurementAggregate).delete()
+    # 요약이 끝난 날짜는 event_rollup 에서 이어받고, 경계 이후의 원본만 다시 읽는다.
+    rollups_q = select(EventRollup.__table__).order_by(EventRollup.day).execution_options(yield_per=chunk_size)
+    for r in db.session.execute(rollups_q):
+        fold_rollup(state(r.login_id, r.shorts_url), r)
+    boundary = compacted_until()
+    events_q = select(EventLog.login_id, EventLog.shorts_url, EventLog.event_type, EventLog.event_timestamp).where(EventLog.shorts_url != 'N/A').order_by(EventLog.event_timestamp, EventLog.id).execution_options(yield_per=chunk_size)
+    if boundary is not None: events_q = events_q.where(EventLog.event_timestamp >= as_kst(boundary))
+    for login_id, shorts_url, event_type, event_timestamp in db.session.execute(events_q):
+        try:
+            ts = to_kst_naive(event_timestamp)
+        except (TypeError, ValueError):
+            continue
+        a = state(login_id, shorts_url)
+        update_measurement(a, event_type, ts)
+        a.last_event_at = ts
+    comments_q = select(YoutubeComment.author_name, YoutubeComment.shorts_url).where(YoutubeComment.comment_id.like('user_comment_%')).distinct()
+    for login_id, shorts_url in db.session.execute(comments_q):
+        state(login_id, shorts_url).commented = 1
+    rows = [vars(a) for a in aggregates.values()]
+    for i in range(0, len(rows), chunk_size):
+        db.session.execute(insert(MeasurementAggregate), rows[i:i + chunk_size])
+    db.session.commit()
+    return len(rows)
+
+def fold_rollup(a, r):
+    # 하루치 요약을 시간순으로 이어 붙인다. 요약된 날의 이벤트는 그날이 끝날 때까지 반영된 것으로 본다.
+    a.watch_seconds += r.watch_seconds
+    a.comment_seconds += r.comment_seconds
+    if r.first_start_at is not None and (a.first_start_at is None or r.first_start_at < a.first_start_at): a.first_start_at = r.first_start_at
+    if r.last_like_at is not None and (a.last_like_at is None or r.last_like_at > a.last_like_at): a.last_like_at = r.last_like_at
+    if r.last_dislike_at is not None and (a.last_dislike_at is None or r.last_dislike_at > a.last_dislike_at): a.last_dislike_at = r.last_dislike_at
+    a.open_watch_start, a.open_comment_start = r.open_watch_start, r.open_comment_start
+    a.last_event_at = to_kst_naive(kst_midnight(r.day + timedelta(days=1)))
+
+def verify_measurements():
+    # pandas 재계산 결과와 집계 테이블 결과를 쌍 단위로 비교하여 다른 행 목록을 돌려준다.
+    expected, _ = generate_measurement_results('', '')
+    actual, _ = read_measurement_aggregates('', '')
+    expected_map = {(r['login_id'], r['shorts_url']): r for r in expected}
+    actual_map = {(r['login_id'], r['shorts_url']): r for r in actual}
+    def same(a, b):
+        try: return float(a) == float(b)
+        except (TypeError, ValueError): return str(a) == str(b)
+    mismatches = []
+    for key in expected_map.keys() | actual_map.keys():
+        e, a = expected_map.get(key), actual_map.get(key)
+        if e is None or a is None or not all(same(e[c], a[c]) for c in MEASUREMENT_COLUMNS[2:]):
+            mismatches.append((key, e, a))
+    return mismatches
+
 def super_admin_required(f):
     def decorated_function(*args, **kwargs):
         if session.get('user_role') != 'super_admin': return redirect(url_for('admin_page'))
@@ -289,6 +1184,71 @@ def super_admin_required(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
+# 관리자 화면의 테이블/컬럼 목록을 프로세스 단위로 캐시한다. init_db/reset_comments/업로드/이벤트 정리 뒤에 비우고, 다른 프로세스의 변경은 TTL 이 지나면 반영된다.
+_schema_cache = {'tables': None, 'columns': {}, 'loaded_at': 0.0}
+_schema_cache_lock = threading.Lock()
+
+def _load_schema_cache():
+    if _schema_cache['tables'] is None or time.monotonic() - _schema_cache['loaded_at'] > SCHEMA_CACHE_TTL:
+        # 기간 파티션/분리 테이블(event_log_p*)은 event_log 의 일부라 따로 조회 대상에 넣지 않는다
+        _schema_cache['tables'] = [name for name in inspect(db.engine).get_table_names() if partition_range(name) is None]
+        _schema_cache['columns'] = {}
+        _schema_cache['loaded_at'] = time.monotonic()
+
+def cached_table_names():
+    with _schema_cache_lock:
+        _load_schema_cache()
+        return _schema_cache['tables']
+
+def cached_table_columns(table_name):
+    # DB 에 실제로 있는 컬럼 이름 (DB 순서)
+    with _schema_cache_lock:
+        _load_schema_cache()
+        if table_name not in _schema_cache['columns']: _schema_cache['columns'][table_name] = [c['name'] for c in inspect(db.engine).get_columns(table_name)]
+        return _schema_cache['columns'][table_name]
+
+def invalidate_schema_cache():
+    with _schema_cache_lock:
+        _schema_cache['tables'] = None
+
+def encode_cursor(row, pk):
+    return json.dumps([row[c.name] for c in pk], separators=(',', ':'))
+
+def decode_cursor(value, pk):
+    # 형식이 맞지 않는 커서는 무시하고 첫 페이지를 보여 준다
+    if not value: return None
+    try: values = json.loads(value)
+    except ValueError: return None
+    return values if isinstance(values, list) and len(values) == len(pk) else None
+
+def keyset_page(query, pk, descending=False, after=None, before=None, last=False, page_size=ADMIN_PAGE_SIZE, session=None):
+    """PK 기준 seek 페이지네이션. OFFSET/COUNT 없이 (행 목록, 이전 페이지 커서, 다음 페이지 커서) 를 돌려줍니다. 커서가 없으면 None."""
+    key = tuple_(*pk) if len(pk) > 1 else pk[0]
+    bound = lambda values: tuple_(*values) if len(pk) > 1 else values[0]
+    # 이전 페이지/마지막 페이지는 반대 방향으로 읽은 뒤 뒤집는다
+    backward = before is not None or last
+    cursor = before if backward else after
+    ascending = descending == backward
+    if cursor is not None: query = query.where(key > bound(cursor) if ascending else key < bound(cursor))
+    query = query.order_by(*(c.asc() if ascending else c.desc() for c in pk)).limit(page_size + 1)
+    rows = [dict(r) for r in (session or db.session).execute(query).mappings()]
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backward: rows.reverse()
+    has_prev, has_next = (more, cursor is not None) if backward else (cursor is not None, more)
+    return rows, encode_cursor(rows[0], pk) if rows and has_prev else None, encode_cursor(rows[-1], pk) if rows and has_next else None
+
+def estimated_row_count(table_name):
+    # 플래너 통계의 행 수 추정치. 통계가 아직 없으면 None (파티션 테이블은 파티션 합계)
+    if db.engine.dialect.name == 'postgresql':
+        count = db.session.execute(text("SELECT sum(c.reltuples) FROM pg_class c WHERE c.reltuples >= 0 AND ((c.oid = to_regclass(:t) AND c.relkind <> 'p') OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(:t)))"), {'t': table_name}).scalar()
+        return int(count) if count is not None else None
+    if db.engine.dialect.name == 'sqlite':
+        if 'sqlite_stat1' not in {r[0] for r in db.session.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}: return None
+        stat = db.session.execute(text("SELECT stat FROM sqlite_stat1 WHERE tbl = :t LIMIT 1"), {'t': table_name}).scalar()
+        return int(stat.split()[0]) if stat else None
+    return None
+
 def admin_access_required(f):
     def decorated_function(*args, **kwargs):
         if session.get('user_role') not in ['admin', 'super_admin']: return redirect(url_for('login_page'))
@@ -299,33 +1259,102 @@ def admin_access_required(f):
 @app.route('/admin', methods=['GET', 'POST'])
 @admin_access_required
 def admin_page():
-    inspector = inspect(db.engine)
-    table_names = inspector.get_table_names()
+    table_names = cached_table_names()
     args = request.values
     table_name = args.get('table')
     search_login_id = args.get('search_login_id', '')
     search_shorts_url = args.get('search_shorts_url', '')
-    page = args.get('page', 1, type=int)
+    date_from, date_to = search_date(args.get('date_from')), search_date(args.get('date_to'))
     clear_success = args.get('clear_success')
-    if not table_name: return render_template('admin.html', tables=table_names, clear_success=clear_success, user_role=session.get('user_role'))
+    archives = list_archives() if session.get('user_role') == 'super_admin' else []
+    jobs = recent_jobs()
+    if not table_name: return render_template('admin.html', tables=table_names, clear_success=clear_success, archives=archives, jobs=jobs, user_role=session.get('user_role'))
     if table_name == 'measurement_results':
-        data, columns = generate_measurement_results(search_login_id, search_shorts_url)
-        return render_template('admin.html', tables=table_names, selected_table=table_name, columns=columns, data=data, search_login_id=search_login_id, search_shorts_url=search_shorts_url, user_role=session.get('user_role'))
+        data, columns = get_measurement_results(search_login_id, search_shorts_url, date_from, date_to)
+        return render_template('admin.html', tables=table_names, selected_table=table_name, columns=columns, data=data, search_login_id=search_login_id, search_shorts_url=search_shorts_url, date_from=date_from, date_to=date_to, user_role=session.get('user_role'))
     Model = MODELS.get(table_name)
-    if not Model: return render_template('admin.html', tables=table_names, error="Table not found", user_role=session.get('user_role'))
-    query = Model.query
-    if table_name == 'youtube_comment':
-        if search_login_id: query = query.filter(Model.author_name.like(f"%{search_login_id}%"))
-        if search_shorts_url: query = query.filter(Model.shorts_url.like(f"%{search_shorts_url}%"))
-    else:
-        if search_login_id and hasattr(Model, 'login_id'): query = query.filter(Model.login_id.like(f"%{search_login_id}%"))
-        if search_shorts_url and hasattr(Model, 'shorts_url'): query = query.filter(Model.shorts_url.like(f"%{search_shorts_url}%"))
-    if table_name == 'event_log' and hasattr(Model, 'id'): query = query.order_by(Model.id.desc())
-    pagination = query.paginate(page=page, per_page=100, error_out=False)
-    results = pagination.items
-    data = [{c.key: getattr(d, c.key) for c in inspect(Model).c} for d in results]
-    columns = [c.key for c in inspect(Model).c]
-    return render_template('admin.html', tables=table_names, selected_table=table_name, columns=columns, data=data, pagination=pagination, search_login_id=search_login_id, search_shorts_url=search_shorts_url, clear_success=clear_success, user_role=session.get('user_role'))
+    if not Model or table_name not in table_names: return render_template('admin.html', tables=table_names, error="Table not found", user_role=session.get('user_role'))
+    table = Model.__table__
+    pk = list(table.primary_key.columns)
+    columns = [name for name in cached_table_columns(table_name) if name in table.c]
+    query = filter_table_query(select(*(table.c[name] for name in columns)), Model, search_login_id, search_shorts_url)
+    # event_log 는 최신 이벤트부터, 나머지는 PK 순서로 보여 준다
+    row_count_exact = args.get('count') == 'exact'
+    with read_session() as reads:
+        data, prev_cursor, next_cursor = keyset_page(query, pk, descending=table_name == 'event_log', after=decode_cursor(args.get('after'), pk), before=decode_cursor(args.get('before'), pk), last=args.get('last') == '1', session=reads)
+        if row_count_exact: row_count = reads.execute(select(func.count()).select_from(query.subquery())).scalar()
+    if not row_count_exact: row_count = estimated_row_count(table_name) if not search_login_id and not search_shorts_url else None
+    page_args = {'table': table_name, 'search_login_id': search_login_id, 'search_shorts_url': search_shorts_url}
+    current_page = {k: args.get(k) for k in ('after', 'before', 'last') if args.get(k)}
+    return render_template('admin.html', tables=table_names, selected_table=table_name, columns=columns, data=data, prev_cursor=prev_cursor, next_cursor=next_cursor, row_count=row_count, row_count_exact=row_count_exact, page_args=page_args, current_page=current_page, search_login_id=search_login_id, search_shorts_url=search_shorts_url, clear_success=clear_success, archives=archives, jobs=jobs, user_role=session.get('user_role'))
+
+def filter_table_query(query, Model, search_login_id, search_shorts_url):
+    # ORM Query 와 Core select 모두에 쓰는 관리자 검색 조건. youtube_comment 는 작성자명으로 login_id 를 찾는다.
+    login_col = Model.author_name if Model is YoutubeComment else getattr(Model, 'login_id', None)
+    return query.filter(*search_conditions(login_col, getattr(Model, 'shorts_url', None), search_login_id, search_shorts_url))
+
+def search_conditions(login_col, url_col, search_login_id, search_shorts_url):
+    # 부분 일치 검색. 검색어의 % _ 는 와일드카드가 아니라 글자 그대로 찾도록 이스케이프한다.
+    conditions = []
+    if search_login_id and login_col is not None: conditions.append(login_col.contains(search_login_id, autoescape=True))
+    if search_shorts_url and url_col is not None: conditions.append(url_col.contains(search_shorts_url, autoescape=True))
+    return conditions
+
+def search_date(value):
+    # 관리자 기간 검색의 YYYY-MM-DD 입력. 비어 있거나 형식이 틀리면 기간 없이 검색한다.
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+def export_value(value):
+    # 내보내기/백업 셀 값. 시각은 KST 벽시계로, JSON 컬럼(dict/list)은 엑셀이 받을 수 있게 JSON 문자열로 바꾼다.
+    if isinstance(value, datetime): return to_kst_naive(value)
+    if isinstance(value, (dict, list)): return json.dumps(value, ensure_ascii=False)
+    return value
+
+def export_rows(table_name, search_login_id, search_shorts_url, date_from=None, date_to=None):
+    # (컬럼 목록, 행 iterator). 일반 테이블은 ORM 객체 없이 서버 측 커서로 EXPORT_CHUNK_SIZE 씩 읽어 온다. 기간은 measurement_results 에만 적용.
+    if table_name == 'measurement_results':
+        data, columns = get_measurement_results(search_login_id, search_shorts_url, date_from, date_to)
+        return columns, ([row[c] for c in columns] for row in data)
+    Model = MODELS[table_name]
+    table = Model.__table__
+    stmt = filter_table_query(select(table), Model, search_login_id, search_shorts_url).order_by(*table.primary_key.columns)
+    engine = read_engine()
+    def rows():
+        # 읽기 엔진의 별도 연결을 행을 다 내보낼 때까지 잡고 있는다
+        with engine.connect() as conn:
+            for row in conn.execution_options(yield_per=EXPORT_CHUNK_SIZE).execute(stmt):
+                yield [export_value(v) for v in row]
+    return [c.key for c in table.columns], rows()
+
+def write_xlsx(columns, rows, sheet_name, output=None):
+    # constant_memory 모드는 행을 쓰는 즉시 내보내고, 결과 파일은 일정 크기를 넘으면 디스크로 넘어가는 임시 파일에 쓴다.
+    import xlsxwriter
+    output = output or tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd hh:mm:ss.000'})
+    worksheet = workbook.add_worksheet(sheet_name[:31])
+    worksheet.write_row(0, 0, columns)
+    for i, row in enumerate(rows, start=1):
+        worksheet.write_row(i, 0, row)
+    workbook.close()
+    output.seek(0)
+    return output
+
+def stream_csv(columns, rows):
+    # 엑셀에서 한글이 깨지지 않도록 BOM 을 붙이고, EXPORT_CHUNK_SIZE 행마다 응답으로 흘려보낸다.
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(columns)
+    for i, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if i % EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
 
 @app.route('/admin/download_excel', methods=['POST'])
 @admin_access_required
@@ -333,24 +1362,85 @@ def download_excel():
     table_name = request.form.get('table_name_for_download')
     search_login_id = request.form.get('search_login_id')
     search_shorts_url = request.form.get('search_shorts_url')
-    if table_name == 'measurement_results':
-        data, _ = generate_measurement_results(search_login_id, search_shorts_url)
-        df = pd.DataFrame(data)
-    else:
-        Model = MODELS.get(table_name)
-        if not Model: return "Table not found", 404
-        query = Model.query
-        if search_login_id and hasattr(Model, 'login_id'): query = query.filter(Model.login_id.like(f"%{search_login_id}%"))
-        if search_shorts_url and hasattr(Model, 'shorts_url'): query = query.filter(Model.shorts_url.like(f"%{search_shorts_url}%"))
-        results = query.all()
-        data = [{c.key: getattr(d, c.key) for c in inspect(Model).c} for d in results]
-        df = pd.DataFrame(data)
-    output = io.BytesIO()
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
-    df.to_excel(writer, index=False, sheet_name=table_name)
-    writer.close()
-    output.seek(0)
-    return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', as_attachment=True, download_name=f'{table_name}.xlsx')
+    date_from, date_to = request.form.get('date_from') or '', request.form.get('date_to') or ''
+    export_format = request.form.get('export_format', 'xlsx')
+    if table_name != 'measurement_results' and table_name not in MODELS: return "Table not found", 404
+    if request.form.get('background'):
+        job, _ = enqueue_job('export', {'table_name': table_name, 'search_login_id': search_login_id or '', 'search_shorts_url': search_shorts_url or '', 'date_from': date_from, 'date_to': date_to, 'export_format': export_format})
+        return redirect(url_for('admin_page', clear_success=f"내보내기 작업 #{job.id} 을(를) 등록했습니다. 완료되면 작업 목록에서 내려받을 수 있습니다."))
+    columns, rows = export_rows(table_name, search_login_id, search_shorts_url, search_date(date_from), search_date(date_to))
+    if export_format == 'csv':
+        return Response(stream_with_context(stream_csv(columns, rows)), mimetype='text/csv; charset=utf-8', headers={'Content-Disposition': f'attachment; filename={table_name}.csv'})
+    return send_file(write_xlsx(columns, rows, table_name), mimetype=XLSX_MIMETYPE, as_attachment=True, download_name=f'{table_name}.xlsx')
+
+def write_archive_chunks(writer, table, after=None, chunk_size=ARCHIVE_CHUNK_SIZE, release=True, until=None, archived=None):
+    # PK 순서로 chunk_size 씩 끊어 읽는 keyset 조회. release 면 청크마다 트랜잭션을 끝내 오래 붙잡지 않는다. (마지막 PK, 쓴 행 수)를 돌려준다.
+    # until 이 있으면 그 PK 까지만 읽고, archived(PK 집합)가 있으면 이미 있는 키는 건너뛰고 쓴 키를 더한다.
+    pk = list(table.primary_key.columns)
+    count = 0
+    while True:
+        stmt = select(table).order_by(*pk).limit(chunk_size)
+        if after is not None: stmt = stmt.where(tuple_(*pk) > tuple_(*after))
+        if until is not None: stmt = stmt.where(tuple_(*pk) <= tuple_(*until))
+        rows = db.session.execute(stmt).all()
+        if not rows: return after, count
+        after = tuple(getattr(rows[-1], c.key) for c in pk)
+        if archived is not None:
+            rows = [row for row in rows if tuple(getattr(row, c.key) for c in pk) not in archived]
+            archived.update(tuple(getattr(row, c.key) for c in pk) for row in rows)
+        writer.writerows([export_value(v) for v in row] for row in rows)
+        count += len(rows)
+        if release: db.session.commit()
+
+def archive_and_clear(Model, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """테이블 전체를 ARCHIVE_DIR 에 csv.gz 로 백업한 뒤 비웁니다. (파일명, 행 수)를 돌려주며 빈 테이블이면 파일을 만들지 않습니다.
+
+    대부분의 행은 잠금 없이 PK 청크로 내보내고, 쓰기 잠금(PostgreSQL ACCESS EXCLUSIVE, SQLite BEGIN IMMEDIATE)을 잡은 뒤
+    그 사이 새로 들어온 행만 이어 쓴 다음 TRUNCATE(SQLite 는 DELETE) 한다. PK 가 단조 증가하지 않는 테이블도 백업되지 않은 행이 지워지지 않는다.
+    """
+    table = Model.__table__
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    filename = f"{table.name}_backup_{datetime.now(KST).strftime('%Y%m%d%H%M%S')}.csv.gz"
+    partial = os.path.join(ARCHIVE_DIR, filename + '.partial')
+    try:
+        with gzip.open(partial, 'wt', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow([c.key for c in table.columns])
+            # 자동 증가 PK 는 새 행이 항상 last 뒤에 붙지만, 문자열 등 다른 PK 는 앞쪽에 끼어들 수 있어 내보낸 키를 기억해 두고 잠근 뒤 다시 훑는다.
+            archived = None if table.autoincrement_column is not None else set()
+            last, count = write_archive_chunks(writer, table, chunk_size=chunk_size, archived=archived)
+            db.session.execute(text(f'LOCK TABLE {table.name} IN ACCESS EXCLUSIVE MODE' if db.engine.dialect.name == 'postgresql' else 'BEGIN IMMEDIATE'))
+            if archived is not None and last is not None:
+                count += write_archive_chunks(writer, table, None, chunk_size, release=False, until=last, archived=archived)[1]
+            last, tail = write_archive_chunks(writer, table, last, chunk_size, release=False)
+            count += tail
+            if count: db.session.execute(text(f'TRUNCATE TABLE {table.name}') if db.engine.dialect.name == 'postgresql' else table.delete())
+        if not count:
+            db.session.rollback()
+            os.remove(partial)
+            return None, 0
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        if os.path.exists(partial): os.remove(partial)
+        raise
+    os.replace(partial, os.path.join(ARCHIVE_DIR, filename))
+    return filename, count
+
+def list_archives():
+    if not os.path.isdir(ARCHIVE_DIR): return []
+    archives = [{'name': name, 'size': os.path.getsize(os.path.join(ARCHIVE_DIR, name)), 'created_at': datetime.fromtimestamp(os.path.getmtime(os.path.join(ARCHIVE_DIR, name)), KST).strftime('%Y-%m-%d %H:%M:%S')} for name in os.listdir(ARCHIVE_DIR) if name.endswith('.csv.gz')]
+    return sorted(archives, key=lambda a: a['created_at'], reverse=True)
+
+MEASUREMENT_SOURCE_TABLES = ('event_log', 'event_rollup', 'youtube_comment')  # 비우면 measurement_aggregate 를 다시 계산해야 하는 테이블
+
+def reset_measurement_state(table_name):
+    # 측정결과 화면은 기본으로 measurement_aggregate 를 읽으므로, 원본을 비운 뒤에도 지운 데이터가 보이지 않게 남은 원본으로 다시 계산한다.
+    # event_log 를 비우면 그 요약(event_rollup)과 경계(event_compaction)도 함께 지운다. 집계 재계산과 한 트랜잭션으로 커밋된다.
+    if table_name == 'event_log':
+        db.session.query(EventRollup).delete()
+        db.session.query(EventCompaction).delete()
+    return rebuild_measurements()
 
 @app.route('/admin/clear_table', methods=['POST'])
 @super_admin_required
@@ -359,97 +1449,947 @@ def clear_table():
     if not table_name: return redirect(url_for('admin_page'))
     Model = MODELS.get(table_name)
     if not Model: return "Table not found", 404
-    results = Model.query.all()
-    if results:
-        data = [{c.key: getattr(d, c.key) for c in inspect(Model).c} for d in results]
-        df = pd.DataFrame(data)
-        output = io.BytesIO()
-        writer = pd.ExcelWriter(output, engine='xlsxwriter')
-        df.to_excel(writer, index=False, sheet_name=table_name)
-        writer.close()
-        output.seek(0)
-        db.session.query(Model).delete()
-        db.session.commit()
-        timestamp = datetime.now(KST).strftime('%Y%m%d%H%M%S')
-        filename = f"{table_name}_backup_{timestamp}.xlsx"
-        return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', as_attachment=True, download_name=filename)
-    else:
+    filename, count = archive_and_clear(Model)
+    if not count:
         message = f"'{table_name}' 테이블에 데이터가 없어 초기화를 진행하지 않았습니다."
         return redirect(url_for('admin_page', clear_success=message))
+    if table_name in ('shorts', 'youtube_comment'): invalidate_shorts_cache()
+    if table_name == 'youtube_comment': invalidate_comment_cache()
+    if table_name in ('shorts_activity', 'user_last_state'): invalidate_activity_cache()
+    if table_name in MEASUREMENT_SOURCE_TABLES: reset_measurement_state(table_name)
+    message = f"'{table_name}' 테이블 {count}개 행을 백업({filename})한 뒤 초기화했습니다."
+    return redirect(url_for('admin_page', clear_success=message))
+
+@app.route('/admin/archives/<path:filename>')
+@super_admin_required
+def download_archive(filename):
+    return send_from_directory(ARCHIVE_DIR, filename, as_attachment=True)
+
+class UploadError(Exception):
+    pass
+
+def upload_columns(table, header):
+    # 헤더를 모델 컬럼과 대조한다. 모르는 컬럼이나 빠진 필수 컬럼이 있으면 파일 전체를 거부.
+    header = [str(h).strip() if h is not None else '' for h in header]
+    unknown = [h for h in header if h and h not in table.columns]
+    if unknown: raise UploadError(f"테이블에 없는 컬럼: {', '.join(unknown)}")
+    duplicated = {h for h in header if h and header.count(h) > 1}
+    if duplicated: raise UploadError(f"중복된 컬럼: {', '.join(sorted(duplicated))}")
+    missing = [c.key for c in table.columns if not c.nullable and c.default is None and not (c.primary_key and isinstance(c.type, db.Integer)) and c.key not in header]
+    if missing: raise UploadError(f"필수 컬럼 누락: {', '.join(missing)}")
+    return header
+
+def coerce_value(column, value):
+    if isinstance(value, str) and value.strip() == '': value = None
+    if isinstance(value, float) and math.isnan(value): value = None
+    if value is None:
+        if column.default is not None and column.default.is_scalar: return column.default.arg
+        if not column.nullable and not (column.primary_key and isinstance(column.type, db.Integer)): raise ValueError(f"{column.key} 값이 비어 있습니다.")
+        return None
+    if isinstance(column.type, db.Integer):
+        if isinstance(value, bool): raise ValueError(f"{column.key}: 정수가 아닙니다 ({value!r})")
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            number = None
+        if number is None or not number.is_integer(): raise ValueError(f"{column.key}: 정수가 아닙니다 ({value!r})")
+        return int(number)
+    if isinstance(column.type, db.String):
+        if isinstance(value, float) and value.is_integer(): value = int(value)
+        value = str(value)
+        if column.type.length and len(value) > column.type.length: raise ValueError(f"{column.key}: {column.type.length}자를 넘습니다.")
+    return value
+
+def read_upload_rows(file, table):
+    # openpyxl read_only 모드로 시트를 한 줄씩 읽어 (엑셀 행 번호, 값 dict 또는 오류 메시지)를 돌려준다.
+    import openpyxl
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = upload_columns(table, next(rows, None) or [])
+        for row_number, values in enumerate(rows, start=2):
+            if values is None or all(v is None or (isinstance(v, str) and not v.strip()) for v in values): continue
+            try:
+                record = {name: coerce_value(table.columns[name], value) for name, value in zip(header, values) if name}
+                yield row_number, {k: v for k, v in record.items() if not (v is None and table.columns[k].primary_key)}, None
+            except (ValueError, TypeError) as e:
+                yield row_number, None, str(e)
+    finally:
+        workbook.close()
+
+def copy_rows(table, records):
+    # PostgreSQL COPY. None 은 따옴표 없는 빈 값(NULL), 문자열은 모두 따옴표로 감싸 빈 문자열과 구분한다.
+    columns = list(records[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for record in records: writer.writerow([record[c] for c in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+def write_upload_chunk(table, records, mode):
+    # 같은 컬럼 조합끼리 묶어 executemany(또는 COPY)로 넣는다.
+    groups = {}
+    for record in records: groups.setdefault(tuple(record), []).append(record)
+    for group in groups.values():
+        if mode == 'upsert':
+            key = UPLOAD_MERGE_KEYS[table.name]
+            stmt = dialect_insert(table)
+            updates = {c: stmt.excluded[c] for c in group[0] if c != key and not table.columns[c].primary_key}
+            stmt = stmt.on_conflict_do_update(index_elements=[key], set_=updates) if updates else stmt.on_conflict_do_nothing(index_elements=[key])
+            db.session.execute(stmt, group)
+        elif db.engine.dialect.name == 'postgresql':
+            copy_rows(table, group)
+        else:
+            db.session.execute(insert(table), group)
+
+def load_upload_chunk(table, chunk, mode, errors):
+    # 청크를 SAVEPOINT 안에서 넣고, 실패하면 한 행씩 다시 넣어 문제 행만 오류로 남긴다.
+    try:
+        with db.session.begin_nested():
+            write_upload_chunk(table, [record for _, record in chunk], mode)
+        return len(chunk)
+    except Exception:
+        loaded = 0
+        for row_number, record in chunk:
+            try:
+                with db.session.begin_nested():
+                    write_upload_chunk(table, [record], mode)
+                loaded += 1
+            except Exception as e:
+                errors.append((row_number, str(getattr(e, 'orig', e)).splitlines()[0]))
+        return loaded
+
+def bulk_upload(file, Model, mode='replace', chunk_size=UPLOAD_CHUNK_SIZE):
+    """엑셀 파일을 청크 단위로 적재합니다. mode='replace' 는 테이블을 비우고 다시 채우고, 'upsert' 는 기준 컬럼으로 병합합니다.
+
+    오류가 난 행은 건너뛰고 (엑셀 행 번호, 사유) 목록으로 돌려줍니다. replace 는 삭제와 적재를 한 트랜잭션으로, upsert 는 청크마다 커밋합니다.
+    """
+    table = Model.__table__
+    key = UPLOAD_MERGE_KEYS[table.name]
+    if mode == 'upsert':
+        # 지원하지 않는 DB 면 행마다 같은 오류를 남기지 않고 파일 전체를 거부한다
+        try:
+            dialect_insert(table)
+        except NotImplementedError as e:
+            raise UploadError(str(e)) from e
+    loaded, errors, seen, chunk = 0, [], set(), []
+    rows = read_upload_rows(file, table)
+    try:
+        if mode == 'replace': db.session.execute(table.delete())
+        for row_number, record, error in rows:
+            if error:
+                errors.append((row_number, error))
+                continue
+            if record.get(key) is not None:
+                if record[key] in seen:
+                    errors.append((row_number, f"파일 안에서 {key} 값이 중복됩니다 ({record[key]})"))
+                    continue
+                seen.add(record[key])
+            chunk.append((row_number, record))
+            if len(chunk) >= chunk_size:
+                loaded += load_upload_chunk(table, chunk, mode, errors)
+                chunk = []
+                if mode == 'upsert': db.session.commit()
+        if chunk: loaded += load_upload_chunk(table, chunk, mode, errors)
+        if db.engine.dialect.name == 'postgresql' and table.name == 'shorts':
+            db.session.execute(text("SELECT setval(pg_get_serial_sequence('shorts', 'seq'), COALESCE((SELECT MAX(seq) FROM shorts), 0) + 1, false)"))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        rows.close()
+    return loaded, sorted(errors)
 
 @app.route('/admin/upload_excel', methods=['POST'])
 @super_admin_required
 def upload_excel():
     table_name = request.form.get('table')
+    mode = request.form.get('mode', 'replace')
     file = request.files.get('excelFile')
-    inspector = inspect(db.engine)
-    table_names = inspector.get_table_names()
-    if table_name not in ['login_user', 'shorts']: return render_template('admin.html', tables=table_names, selected_table=table_name, upload_error="이 테이블은 엑셀 업로드를 지원하지 않습니다.", user_role=session.get('user_role'))
+    table_names = cached_table_names()
+    if table_name not in UPLOAD_MERGE_KEYS: return render_template('admin.html', tables=table_names, selected_table=table_name, upload_error="이 테이블은 엑셀 업로드를 지원하지 않습니다.", user_role=session.get('user_role'))
     if not file or file.filename == '': return render_template('admin.html', tables=table_names, selected_table=table_name, upload_error="업로드할 파일을 선택하세요.", user_role=session.get('user_role'))
+    if not file.filename.lower().endswith('.xlsx'): return render_template('admin.html', tables=table_names, selected_table=table_name, upload_error="xlsx 파일만 업로드할 수 있습니다.", user_role=session.get('user_role'))
+    if mode not in ('replace', 'upsert'): mode = 'replace'
     Model = MODELS.get(table_name)
     try:
-        df = pd.read_excel(file)
-        db.session.query(Model).delete()
-        for _, row in df.iterrows():
-            new_record = Model(**row.to_dict())
-            db.session.add(new_record)
-        db.session.commit()
-        return render_template('admin.html', tables=table_names, selected_table=table_name, upload_success=f"{len(df)}개의 행이 {table_name} 테이블에 업로드되었습니다.", user_role=session.get('user_role'))
+        loaded, errors = bulk_upload(file, Model, mode)
+        invalidate_shorts_cache()
+        invalidate_schema_cache()
+        message = f"{loaded}개의 행이 {table_name} 테이블에 {'병합' if mode == 'upsert' else '업로드'}되었습니다."
+        if errors: message += f" 오류로 건너뛴 행: {len(errors)}개"
+        return render_template('admin.html', tables=table_names, selected_table=table_name, upload_success=message, upload_row_errors=errors[:UPLOAD_ERROR_LIMIT], user_role=session.get('user_role'))
     except Exception as e:
         db.session.rollback()
         return render_template('admin.html', tables=table_names, selected_table=table_name, upload_error=f"업로드 실패: {str(e)}", user_role=session.get('user_role'))
 
-def crawl_comments_task():
-    with app.app_context():
-        global CRAWL_STATUS
+# --- 유튜브 댓글 크롤러 ---
+class QuotaExceeded(Exception):
+    pass
+
+class TokenBucket:
+    # 초당 rate개씩 토큰을 채우는 요청 속도 제한기. budget(할당량 단위)을 다 쓰면 QuotaExceeded 를 던진다.
+    def __init__(self, rate, capacity=None, budget=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.budget = budget
+        self.used = 0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, cost=1):
+        while True:
+            with self.lock:
+                if self.budget is not None and self.used + cost > self.budget:
+                    raise QuotaExceeded(f"할당량 소진 ({self.used}/{self.budget})")
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    self.used += cost
+                    return
+                wait = (cost - self.tokens) / self.rate
+            time.sleep(wait)
+
+# 디스커버리 문서는 네트워크에서 받지 않고 로컬 파일(update_discovery_doc 로 갱신)이나 라이브러리에 포함된 문서를 프로세스당 한 번만 파싱한다.
+_youtube_discovery = {'doc': None}
+_youtube_discovery_lock = threading.Lock()
+
+def youtube_discovery_doc():
+    with _youtube_discovery_lock:
+        if _youtube_discovery['doc'] is None:
+            if os.path.exists(YOUTUBE_DISCOVERY_DOC):
+                with open(YOUTUBE_DISCOVERY_DOC, encoding='utf-8') as f: content = f.read()
+            else:
+                from googleapiclient.discovery_cache import get_static_doc
+                content = get_static_doc('youtube', 'v3')
+                if content is None: raise RuntimeError(f"YouTube 디스커버리 문서가 없습니다. flask update_discovery_doc 로 {YOUTUBE_DISCOVERY_DOC} 를 만드세요.")
+            _youtube_discovery['doc'] = json.loads(content)
+        return _youtube_discovery['doc']
+
+def youtube_client():
+    from googleapiclient.discovery import build_from_document
+    return build_from_document(youtube_discovery_doc(), developerKey=YOUTUBE_API_KEY)
+
+def shorts_video_id(shorts_url):
+    return shorts_url.split('?')[0].split('/shorts/')[-1]
+
+def http_error_reasons(error):
+    details = error.error_details if isinstance(error.error_details, list) else []
+    return {d.get('reason') for d in details if isinstance(d, dict)}
+
+def execute_with_retry(api_request, bucket, max_retries=CRAWL_MAX_RETRIES):
+    # 호출마다 토큰을 받고, 429/5xx·일시적 속도 제한·네트워크 오류는 지수 백오프로 재시도한다.
+    from googleapiclient.errors import HttpError
+    for attempt in range(max_retries + 1):
+        bucket.acquire()
         try:
-            if not YOUTUBE_API_KEY:
-                CRAWL_STATUS['progress'] = "오류: YouTube API 키가 환경 변수에 설정되지 않았습니다."
-                CRAWL_STATUS['is_running'] = False
-                return
-            youtube = build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
-            shorts_to_crawl = Shorts.query.filter_by(use_yn='Y').all()
-            total_videos = len(shorts_to_crawl)
-            for i, short in enumerate(shorts_to_crawl):
-                video_id = short.url.split('?')[0].split('/shorts/')[-1]
-                CRAWL_STATUS['progress'] = f"({i+1}/{total_videos}) 영상 '{video_id}'의 인기 댓글 100개 수집 중..."
-                YoutubeComment.query.filter_by(shorts_url=short.url).delete()
-                db.session.commit()
-                response = youtube.commentThreads().list(
-                    part="snippet,replies", videoId=video_id, maxResults=100, order="relevance"
-                ).execute()
-                for item in response['items']:
-                    comment = item['snippet']['topLevelComment']['snippet']
-                    new_comment = YoutubeComment(shorts_url=short.url, comment_id=item['id'], parent_id=None, author_name=comment['authorDisplayName'], comment_text=comment['textDisplay'], published_at=comment['publishedAt'], like_count=comment['likeCount'], author_profile_image_url=comment['authorProfileImageUrl'])
-                    db.session.add(new_comment)
-                    if 'replies' in item:
-                        for reply_item in item['replies']['comments']:
-                            reply = reply_item['snippet']
-                            new_reply = YoutubeComment(shorts_url=short.url, comment_id=reply_item['id'], parent_id=item['id'], author_name=reply['authorDisplayName'], comment_text=reply['textDisplay'], published_at=reply['publishedAt'], like_count=reply['likeCount'], author_profile_image_url=reply['authorProfileImageUrl'])
-                            db.session.add(new_reply)
-                db.session.commit()
-            CRAWL_STATUS['progress'] = f"완료: 총 {total_videos}개 영상의 인기 댓글 수집 완료."
-        except Exception as e:
+            return api_request.execute()
+        except HttpError as e:
+            reasons = http_error_reasons(e)
+            if reasons & {'quotaExceeded', 'dailyLimitExceeded'}: raise QuotaExceeded(str(e)) from e
+            retryable = e.resp.status in CRAWL_RETRY_STATUSES or bool(reasons & {'rateLimitExceeded', 'userRateLimitExceeded'})
+            if not retryable or attempt == max_retries: raise
+        except (OSError, TimeoutError):
+            if attempt == max_retries: raise
+        time.sleep(min(2 ** attempt, 32) + random.random())
+
+def comment_row(shorts_url, comment_id, parent_id, snippet):
+    return {'shorts_url': shorts_url, 'comment_id': comment_id, 'parent_id': parent_id, 'author_name': snippet['authorDisplayName'], 'comment_text': snippet['textDisplay'], 'published_at': as_kst(snippet['publishedAt']), 'like_count': snippet['likeCount'], 'author_profile_image_url': snippet['authorProfileImageUrl']}
+
+def fetch_video_comments(youtube, shorts_url, bucket, max_comments=CRAWL_MAX_COMMENTS):
+    """영상 하나의 인기 댓글 스레드를 max_comments개까지 가져와 insert 용 dict 목록으로 반환합니다 (DB 접근 없음)."""
+    from googleapiclient.errors import HttpError
+    rows, threads, page_token = [], 0, None
+    while threads < max_comments:
+        params = {'part': 'snippet,replies', 'videoId': shorts_video_id(shorts_url), 'maxResults': min(100, max_comments - threads), 'order': 'relevance'}
+        if page_token: params['pageToken'] = page_token
+        try:
+            response = execute_with_retry(youtube.commentThreads().list(**params), bucket)
+        except HttpError as e:
+            if 'commentsDisabled' in http_error_reasons(e): return rows
+            raise
+        items = response.get('items', [])
+        for item in items:
+            rows.append(comment_row(shorts_url, item['id'], None, item['snippet']['topLevelComment']['snippet']))
+            for reply_item in item.get('replies', {}).get('comments', []):
+                rows.append(comment_row(shorts_url, reply_item['id'], item['id'], reply_item['snippet']))
+        threads += len(items)
+        page_token = response.get('nextPageToken')
+        if not page_token: break
+    return rows
+
+def remaining_crawl_quota():
+    since = datetime.now(KST) - timedelta(days=1)
+    used = db.session.query(func.coalesce(func.sum(CrawlRun.quota_used), 0)).filter(CrawlRun.started_at >= since).scalar()
+    return max(0, CRAWL_DAILY_QUOTA - used)
+
+def replace_video_comments(run, shorts_url, rows, quota_used):
+    # 크롤링 댓글 교체와 체크포인트 기록을 한 트랜잭션으로 커밋한다. 사용자가 작성한 댓글(user_comment_*)은 남겨 둔다.
+    try:
+        YoutubeComment.query.filter(YoutubeComment.shorts_url == shorts_url, ~YoutubeComment.comment_id.like('user_comment_%')).delete(synchronize_session=False)
+        if rows: db.session.execute(insert(YoutubeComment), rows)
+        db.session.add(CrawlCheckpoint(run_id=run.id, shorts_url=shorts_url, comment_count=len(rows), completed_at=datetime.now(KST)))
+        run.quota_used = quota_used
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    invalidate_shorts_cache()
+    invalidate_comment_cache(shorts_url)
+
+def crawl_comments(client_factory=None, bucket=None, max_workers=CRAWL_WORKERS, max_comments=CRAWL_MAX_COMMENTS, resume=True, progress=None):
+    """사용 중인 숏츠의 댓글을 병렬로 수집합니다.
+
+    API 호출은 워커 스레드(스레드마다 client_factory()로 만든 클라이언트)에서, DB 쓰기는 호출한 스레드에서만 한다.
+    영상 단위로 체크포인트를 남기므로 중단된 실행은 다음 호출 때 남은 영상부터 이어서 진행한다.
+    """
+    client_factory = client_factory or youtube_client
+    run = CrawlRun.query.filter(CrawlRun.finished_at.is_(None)).order_by(CrawlRun.id.desc()).first()
+    if run and run.status == 'incomplete':
+        # 실패 영상만 남은 실행을 이어받으면 계속 실패하는 영상 하나 때문에 다른 영상이 갱신되지 않으므로 닫고 새로 시작한다
+        run.finished_at = datetime.now(KST)
+        run = None
+    if run and not resume:
+        run.status, run.finished_at = 'abandoned', datetime.now(KST)
+        run = None
+    if run is None:
+        run = CrawlRun(started_at=datetime.now(KST), status='running', quota_used=0)
+        db.session.add(run)
+    run.status = 'running'
+    db.session.commit()
+    bucket = bucket or TokenBucket(CRAWL_REQUESTS_PER_SECOND, budget=remaining_crawl_quota())
+    base_quota = run.quota_used
+    done = {url for (url,) in db.session.query(CrawlCheckpoint.shorts_url).filter_by(run_id=run.id)}
+    urls = [url for (url,) in db.session.query(Shorts.url).filter_by(use_yn='Y').order_by(Shorts.seq)]
+    clients = threading.local()
+
+    def fetch(shorts_url):
+        if not hasattr(clients, 'youtube'): clients.youtube = client_factory()
+        with span('crawl.fetch_video'):
+            return fetch_video_comments(clients.youtube, shorts_url, bucket, max_comments)
+
+    completed, comments, failed, quota_exceeded = len(done & set(urls)), 0, [], False
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='crawl') as pool:
+        futures = {pool.submit(fetch, url): url for url in urls if url not in done}
+        try:
+            for future in as_completed(list(futures)):
+                shorts_url = futures.pop(future)
+                if future.cancelled(): continue
+                try:
+                    rows = future.result()
+                    with span('crawl.save_video'):
+                        replace_video_comments(run, shorts_url, rows, base_quota + bucket.used)
+                except QuotaExceeded:
+                    quota_exceeded = True
+                    for pending in futures: pending.cancel()
+                    continue
+                except Exception as e:
+                    app.logger.warning("댓글 크롤링 실패 (%s): %s", shorts_url, e)
+                    failed.append(shorts_url)
+                    continue
+                completed += 1
+                comments += len(rows)
+                if progress: progress(completed, len(urls), comments, f"영상 '{shorts_video_id(shorts_url)}' 댓글 {len(rows)}개 저장")
+        except BaseException:
+            # 작업 취소 등으로 중단되면 아직 시작하지 않은 호출은 버리고, 실행은 이어받을 수 있게 남겨 둔다.
+            for pending in futures: pending.cancel()
             db.session.rollback()
-            CRAWL_STATUS['progress'] = f"오류 발생: {e}"
-        finally:
-            CRAWL_STATUS['is_running'] = False
+            run.status, run.quota_used = 'interrupted', base_quota + bucket.used
+            db.session.commit()
+            raise
+    run.quota_used = base_quota + bucket.used
+    if quota_exceeded: run.status = 'quota_exceeded'
+    else: run.status, run.finished_at = 'incomplete' if failed else 'completed', datetime.now(KST)
+    db.session.commit()
+    return {'run_id': run.id, 'status': run.status, 'total': len(urls), 'completed': completed, 'comments': comments, 'failed': failed, 'quota_used': run.quota_used}
+
+def crawl_summary(result):
+    counts = f"{result['completed']}/{result['total']}개 영상, 이번 실행에서 댓글 {result['comments']}개 저장"
+    if result['status'] == 'completed': return f"완료: {counts}."
+    if result['status'] == 'quota_exceeded': return f"중단: API 할당량 소진 ({counts}). 다시 시작하면 남은 영상부터 이어서 수집합니다."
+    return f"일부 실패: {counts}, 실패 {len(result['failed'])}개. 실패한 영상은 다음 크롤링에서 다른 영상과 함께 다시 수집합니다."
 
 @app.route('/admin/start_crawl', methods=['POST'])
 @super_admin_required
 def start_crawl():
-    global CRAWL_STATUS
-    if CRAWL_STATUS['is_running']: return jsonify({'status': 'error', 'message': '이미 크롤링이 진행 중입니다.'})
-    CRAWL_STATUS['is_running'] = True
-    CRAWL_STATUS['progress'] = '크롤링 시작...'
-    thread = threading.Thread(target=crawl_comments_task)
-    thread.start()
-    return jsonify({'status': 'success', 'message': '댓글 크롤링을 시작했습니다.'})
+    if not YOUTUBE_API_KEY: return jsonify({'status': 'error', 'message': 'YouTube API 키가 환경 변수에 설정되지 않았습니다.'})
+    # fresh: 중단된 실행을 이어받지 않고 모든 영상을 처음부터 수집 (CLI 의 --fresh)
+    job, created = enqueue_job('crawl', {'resume': False} if request.form.get('fresh') == '1' else {})
+    if not created: return jsonify({'status': 'error', 'message': '이미 크롤링이 진행 중입니다.'})
+    return jsonify({'status': 'success', 'message': '댓글 크롤링을 시작했습니다.', 'job_id': job.id})
 
 @app.route('/admin/crawl_status')
 @admin_access_required
 def crawl_status():
-    return jsonify(CRAWL_STATUS)
+    job = BackgroundJob.query.filter_by(kind='crawl').order_by(BackgroundJob.id.desc()).first()
+    if job is None: return jsonify({'is_running': False, 'progress': '대기 중'})
+    return jsonify({'is_running': job.status in ('queued', 'running'), 'progress': job.progress or JOB_STATUS_LABELS[job.status], 'job_id': job.id, 'status': job.status, 'counters': job.counters})
+
+
+# --- 백그라운드 작업 ---
+# 요청 워커는 background_job 에 작업을 넣기만 하고, 각 프로세스의 러너 스레드가 조건부 UPDATE 로 한 건씩 가져가 실행한다.
+# 같은 종류 작업은 동시에 하나만 돈다 (PostgreSQL 은 advisory lock 으로 가져가기를 직렬화, SQLite 는 쓰기 잠금이 직렬화).
+JOB_HANDLERS = {}
+JOB_CONCURRENT_KINDS = {'export'}  # 같은 종류가 여러 개 동시에 돌아도 되는 작업
+JOB_STATUS_LABELS = {'queued': '대기 중', 'running': '실행 중', 'succeeded': '완료', 'failed': '실패', 'cancelled': '취소됨'}
+
+class JobCancelled(Exception):
+    pass
+
+def job_handler(kind):
+    def register(f):
+        JOB_HANDLERS[kind] = f
+        return f
+    return register
+
+def enqueue_job(kind, params=None):
+    """작업을 등록합니다. 같은 종류가 이미 대기/실행 중이면 그 작업을 돌려줍니다. (작업, 새로 만들었는지)"""
+    existing = BackgroundJob.query.filter(BackgroundJob.kind == kind, BackgroundJob.status.in_(['queued', 'running'])).order_by(BackgroundJob.id).first()
+    if existing and kind not in JOB_CONCURRENT_KINDS: return existing, False
+    job = BackgroundJob(kind=kind, status='queued', params=params or {}, attempts=0, cancel_requested=0, created_at=datetime.now(KST))
+    db.session.add(job)
+    db.session.commit()
+    return job, True
+
+def claim_next_job(worker):
+    # 대기 중인 작업을 오래된 순으로 보며, 같은 종류가 실행 중이 아니면 조건부 UPDATE 로 가져간다. 가져간 작업 id 반환.
+    J = BackgroundJob
+    for job_id, kind in db.session.execute(select(J.id, J.kind).where(J.status == 'queued').order_by(J.id).limit(20)).all():
+        if kind not in JOB_HANDLERS: continue
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(text("SELECT pg_advisory_xact_lock(hashtext('background_job:' || :kind))"), {'kind': kind})
+        now = datetime.now(KST)
+        claim = update(J).where(J.id == job_id, J.status == 'queued').values(status='running', worker=worker, started_at=now, heartbeat_at=now, attempts=J.attempts + 1)
+        if kind not in JOB_CONCURRENT_KINDS:
+            other = J.__table__.alias('running_job')
+            claim = claim.where(~exists().where(other.c.kind == kind, other.c.status == 'running'))
+        claimed = db.session.execute(claim).rowcount
+        db.session.commit()
+        if claimed: return job_id
+    return None
+
+def update_job(job_id, **values):
+    # 작업 쪽 세션의 트랜잭션과 섞이지 않도록 별도 연결로 바로 커밋한다.
+    with db.engine.begin() as conn:
+        conn.execute(update(BackgroundJob).where(BackgroundJob.id == job_id).values(**values))
+
+def job_cancel_requested(job_id):
+    with db.engine.connect() as conn:
+        return bool(conn.execute(select(BackgroundJob.cancel_requested).where(BackgroundJob.id == job_id)).scalar())
+
+class JobContext:
+    # 핸들러에 넘기는 진행 상황 기록기. JOB_PROGRESS_INTERVAL 마다 DB 에 쓰고, 그때 취소 요청이 있으면 JobCancelled 를 던진다.
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.started = time.monotonic()
+        self.written = 0.0
+        self.progress = None
+        self.counters = {}
+
+    def update(self, progress=None, force=False, **counters):
+        if progress is not None: self.progress = progress[:300]
+        self.counters.update(counters)
+        now = time.monotonic()
+        if not force and now - self.written < JOB_PROGRESS_INTERVAL: return
+        self.written = now
+        self.counters['elapsed_s'] = round(now - self.started, 1)
+        try:
+            update_job(self.job_id, progress=self.progress, counters=dict(self.counters), heartbeat_at=datetime.now(KST))
+            cancelled = job_cancel_requested(self.job_id)
+        except Exception as e:
+            # 진행 기록은 부가 정보이므로 (예: SQLite 잠금) 실패해도 작업은 계속한다.
+            app.logger.warning("작업 %s 진행 상황 기록 실패: %s", self.job_id, e)
+            return
+        if cancelled: raise JobCancelled()
+
+def _job_heartbeat(job_id, stop):
+    while not stop.wait(JOB_HEARTBEAT_INTERVAL):
+        try:
+            update_job(job_id, heartbeat_at=datetime.now(KST))
+        except Exception:
+            app.logger.warning("작업 %s heartbeat 기록 실패", job_id)
+
+def run_job(job_id):
+    job = db.session.get(BackgroundJob, job_id)
+    context = JobContext(job_id)
+    stop = threading.Event()
+    threading.Thread(target=_job_heartbeat, args=(job_id, stop), name=f'job-heartbeat-{job_id}', daemon=True).start()
+    try:
+        with span(f"job.{job.kind}"):
+            result = JOB_HANDLERS[job.kind](context, **(job.params or {}))
+        db.session.close()
+        update_job(job_id, status='succeeded', result=result, finished_at=datetime.now(KST))
+    except JobCancelled:
+        db.session.rollback()
+        update_job(job_id, status='cancelled', progress=context.progress, counters=context.counters, finished_at=datetime.now(KST))
+    except Exception as e:
+        db.session.rollback()
+        app.logger.exception("작업 %s (%s) 실패", job_id, job.kind)
+        update_job(job_id, status='failed', error=str(e), progress=context.progress, counters=context.counters, finished_at=datetime.now(KST))
+    finally:
+        stop.set()
+
+def fail_stale_jobs():
+    # heartbeat 가 끊긴 실행 중 작업(작업자 프로세스 종료 등)을 실패로 돌려 다시 시도할 수 있게 한다.
+    J = BackgroundJob
+    limit = datetime.now(KST) - JOB_STALE_AFTER
+    db.session.execute(update(J).where(J.status == 'running', J.heartbeat_at < limit).values(status='failed', error='작업자 응답 없음 (heartbeat 끊김)', finished_at=datetime.now(KST)))
+    db.session.commit()
+
+def schedule_periodic_jobs():
+    if EVENT_MAINTENANCE_INTERVAL <= 0: return
+    since = datetime.now(KST) - timedelta(seconds=EVENT_MAINTENANCE_INTERVAL)
+    recent = BackgroundJob.query.filter(BackgroundJob.kind == 'maintain_events', or_(BackgroundJob.created_at >= since, BackgroundJob.status.in_(['queued', 'running']))).first()
+    if recent is None: enqueue_job('maintain_events')
+
+_job_runner = None
+
+def start_job_runner():
+    # 프로세스 기동 시 한 번만 호출한다 (JOB_RUNNER=1). 요청 처리 중에는 띄우지 않는다.
+    global _job_runner
+    if _job_runner is None:
+        _job_runner = threading.Thread(target=_job_runner_loop, name='job-runner', daemon=True)
+        _job_runner.start()
+    return _job_runner
+
+def _job_runner_loop():
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    housekept_at = 0.0
+    while True:
+        job_id = None
+        with app.app_context():
+            try:
+                # 멈춘 작업 정리와 주기 작업 등록은 heartbeat 간격으로만 한다
+                if time.monotonic() - housekept_at >= JOB_HEARTBEAT_INTERVAL:
+                    fail_stale_jobs()
+                    schedule_periodic_jobs()
+                    housekept_at = time.monotonic()
+                job_id = claim_next_job(worker)
+                if job_id is not None: run_job(job_id)
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("작업 러너 오류")
+        if job_id is None: time.sleep(JOB_POLL_INTERVAL)
+
+@job_handler('crawl')
+def crawl_job(context, **params):
+    if not YOUTUBE_API_KEY: raise RuntimeError("YouTube API 키가 환경 변수에 설정되지 않았습니다.")
+    def progress(done, total, comments, message):
+        elapsed = time.monotonic() - context.started
+        context.update(f"({done}/{total}) {message}", videos_done=done, videos_total=total, comments=comments, comments_per_s=round(comments / elapsed, 1) if elapsed else 0)
+    result = crawl_comments(progress=progress, **params)
+    context.update(crawl_summary(result), force=True, videos_done=result['completed'], videos_total=result['total'], comments=result['comments'], failed=len(result['failed']))
+    return result
+
+@job_handler('export')
+def export_job(context, table_name, search_login_id='', search_shorts_url='', date_from='', date_to='', export_format='xlsx'):
+    columns, rows = export_rows(table_name, search_login_id, search_shorts_url, search_date(date_from), search_date(date_to))
+    def counted(rows):
+        for i, row in enumerate(rows, start=1):
+            context.counters['rows'] = i
+            if i % EXPORT_CHUNK_SIZE == 0: context.update(f"{i}행 기록 중")
+            yield row
+    os.makedirs(JOB_OUTPUT_DIR, exist_ok=True)
+    filename = f"job{context.job_id}_{table_name}.{'csv' if export_format == 'csv' else 'xlsx'}"
+    with open(os.path.join(JOB_OUTPUT_DIR, filename), 'wb') as output:
+        if export_format == 'csv':
+            for chunk in stream_csv(columns, counted(rows)): output.write(chunk.encode('utf-8'))
+        else:
+            write_xlsx(columns, counted(rows), table_name, output)
+    context.update(f"{context.counters.get('rows', 0)}행 내보내기 완료", force=True)
+    return {'file': filename, 'rows': context.counters.get('rows', 0)}
+
+@job_handler('rebuild_measurements')
+def rebuild_measurements_job(context, verify=False):
+    context.update("measurement_aggregate 재계산 중", force=True)
+    count = rebuild_measurements()
+    result = {'rows': count}
+    if verify:
+        context.update("pandas 재계산과 비교 중", force=True, rows=count)
+        result['mismatches'] = len(verify_measurements())
+    context.update(f"{count}개 행 재계산 완료", force=True, **result)
+    return result
+
+@job_handler('maintain_events')
+def maintain_events_job(context):
+    result = maintain_events()
+    context.update(f"{result['compacted_days']}일 요약, 파티션 생성 {len(result['created'])} / 분리 {len(result['moved'])} / 삭제 {len(result['dropped'])}", force=True)
+    return result
+
+def recent_jobs(limit=20):
+    return BackgroundJob.query.order_by(BackgroundJob.id.desc()).limit(limit).all()
+
+@app.route('/admin/jobs', methods=['POST'])
+@super_admin_required
+def start_job():
+    kind = request.form.get('kind')
+    if kind not in ('rebuild_measurements', 'maintain_events'): return "Unknown job", 400
+    job, created = enqueue_job(kind, {'verify': True} if kind == 'rebuild_measurements' else {})
+    message = f"작업 #{job.id} ({kind}) 을(를) 등록했습니다." if created else f"작업 #{job.id} ({kind}) 이(가) 이미 대기/실행 중입니다."
+    return redirect(url_for('admin_page', clear_success=message))
+
+@app.route('/admin/jobs/<int:job_id>')
+@admin_access_required
+def job_status(job_id):
+    job = db.get_or_404(BackgroundJob, job_id)
+    return jsonify({'id': job.id, 'kind': job.kind, 'status': job.status, 'progress': job.progress, 'counters': job.counters, 'result': job.result, 'error': job.error, 'attempts': job.attempts})
+
+@app.route('/admin/jobs/<int:job_id>/cancel', methods=['POST'])
+@super_admin_required
+def cancel_job(job_id):
+    # 대기 중이면 바로 취소, 실행 중이면 다음 진행 기록 때 핸들러가 멈춘다.
+    J = BackgroundJob
+    db.session.execute(update(J).where(J.id == job_id, J.status == 'queued').values(status='cancelled', finished_at=datetime.now(KST)))
+    db.session.execute(update(J).where(J.id == job_id, J.status == 'running').values(cancel_requested=1))
+    db.session.commit()
+    return redirect(url_for('admin_page', clear_success=f"작업 #{job_id} 취소를 요청했습니다."))
+
+@app.route('/admin/jobs/<int:job_id>/retry', methods=['POST'])
+@super_admin_required
+def retry_job(job_id):
+    J = BackgroundJob
+    job = db.get_or_404(J, job_id)
+    retry = update(J).where(J.id == job_id, J.status.in_(['failed', 'cancelled'])).values(status='queued', cancel_requested=0, error=None, worker=None, started_at=None, finished_at=None)
+    if job.kind not in JOB_CONCURRENT_KINDS:
+        other = J.__table__.alias('other_job')
+        retry = retry.where(~exists().where(other.c.kind == job.kind, other.c.status.in_(['queued', 'running']), other.c.id != job_id))
+    retried = db.session.execute(retry).rowcount
+    db.session.commit()
+    message = f"작업 #{job_id} 을(를) 다시 대기열에 넣었습니다." if retried else f"작업 #{job_id} 은(는) 다시 시도할 수 없습니다."
+    return redirect(url_for('admin_page', clear_success=message))
+
+@app.route('/admin/jobs/<int:job_id>/download')
+@admin_access_required
+def download_job_output(job_id):
+    job = db.get_or_404(BackgroundJob, job_id)
+    if job.kind != 'export' or job.status != 'succeeded' or not job.result: return "Output not found", 404
+    return send_from_directory(JOB_OUTPUT_DIR, job.result['file'], as_attachment=True)
+
+
+# --- 스키마 마이그레이션 ---
+# 문자열로 저장하던 시각 컬럼: (테이블, 컬럼, PK)
+TIMESTAMP_MIGRATIONS = [('event_log', 'event_timestamp', 'id'), ('youtube_comment', 'published_at', 'seq')]
+ADDED_COLUMNS = [(MeasurementAggregate, 'last_event_at'), (UserLastState, 'activity_version'), (UserLastState, 'last_watched_at')]  # 기존 DB 에 ALTER TABLE ADD COLUMN 으로 추가하는 nullable 컬럼
+INDEXED_MODELS = [EventLog, YoutubeComment, Shorts, ShortsActivity]
+
+def migrate_schema(chunk_size=10000):
+    # 시각 컬럼을 시간대 있는 timestamp 로 바꾸고 새 컬럼과 조회용 인덱스를 추가한다. 이미 바뀐 컬럼/있는 인덱스는 건너뛴다.
+    db.create_all()
+    done = []
+    for table_name, column, pk in TIMESTAMP_MIGRATIONS:
+        col_type = next(c['type'] for c in inspect(db.engine).get_columns(table_name) if c['name'] == column)
+        if not isinstance(col_type, db.String): continue
+        if db.engine.dialect.name == 'postgresql':
+            # 시간대 표기가 없는 기존 문자열은 KST 로 해석한다 (event_log 는 서버가 KST 로 기록, 댓글은 ISO 8601 표기)
+            using = f"{column}::timestamp AT TIME ZONE 'Asia/Seoul'" if table_name == 'event_log' else f"NULLIF({column}, '')::timestamptz"
+            with db.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table_name} ALTER COLUMN {column} TYPE TIMESTAMP WITH TIME ZONE USING {using}"))
+        else:
+            _rebuild_sqlite_table(MODELS[table_name].__table__, column, pk, chunk_size)
+        done.append(f"{table_name}.{column} -> timestamp")
+    for Model, column in ADDED_COLUMNS:
+        if column not in {c['name'] for c in inspect(db.engine).get_columns(Model.__tablename__)}:
+            with db.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {Model.__tablename__} ADD COLUMN {column} {Model.__table__.c[column].type.compile(db.engine.dialect)}"))
+            done.append(f"{Model.__tablename__}.{column} added")
+    for Model in INDEXED_MODELS:
+        for index in Model.__table__.indexes:
+            if index.name not in {i['name'] for i in inspect(db.engine).get_indexes(Model.__tablename__)}:
+                index.create(db.engine)
+                done.append(f"index {index.name}")
+    if partition_event_log(chunk_size): done.append("event_log -> partitioned by event_timestamp")
+    invalidate_schema_cache()
+    return done
+
+def _rebuild_sqlite_table(table, column, pk, chunk_size):
+    # SQLite 는 컬럼 타입 변경이 안 되므로 새 스키마로 테이블을 만들어 PK 순서대로 옮겨 담는다.
+    old_name = f"{table.name}_old"
+    with db.engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {old_name}"))
+        table.create(conn)
+        last = None
+        while True:
+            where = f"WHERE {pk} > :last " if last is not None else ""
+            rows = conn.execute(text(f"SELECT * FROM {old_name} {where}ORDER BY {pk} LIMIT :limit"), {'last': last, 'limit': chunk_size}).mappings().all()
+            if not rows: break
+            converted = []
+            for row in rows:
+                row = dict(row)
+                try:
+                    row[column] = as_kst(row[column]) if row[column] else None
+                except ValueError:
+                    raise click.ClickException(f"{table.name}.{pk}={row[pk]}: '{row[column]}' 을(를) 시각으로 변환할 수 없습니다.")
+                converted.append(row)
+            conn.execute(insert(table), converted)
+            last = rows[-1][pk]
+        conn.execute(text(f"DROP TABLE {old_name}"))
+
+def index_check_queries():
+    return {
+        'event_log (login_id, shorts_url)': select(EventLog).where(EventLog.login_id == 'u', EventLog.shorts_url == 's'),
+        'shorts_activity (login_id, shorts_url)': select(ShortsActivity).where(ShortsActivity.login_id == 'u', ShortsActivity.shorts_url == 's'),
+        'get_comments': select(YoutubeComment).where(YoutubeComment.shorts_url == 's').order_by(YoutubeComment.published_at),
+        'youtube_comment.parent_id': select(YoutubeComment).where(YoutubeComment.parent_id == 'c'),
+        'comment counts': select(YoutubeComment.shorts_url, func.count()).group_by(YoutubeComment.shorts_url),
+        'shorts.use_yn': select(Shorts).where(Shorts.use_yn == 'Y'),
+    }
+
+def check_index_usage():
+    # 주요 조회의 실행 계획에 인덱스가 쓰이는지 EXPLAIN 으로 확인한다. (이름, 사용 여부, 실행 계획) 목록 반환
+    results = []
+    is_postgres = db.engine.dialect.name == 'postgresql'
+    with db.engine.connect() as conn:
+        # 행이 적은 테이블에서는 플래너가 순차 스캔을 고르므로, 인덱스를 쓸 수 있는지만 보려고 순차 스캔을 끈다.
+        if is_postgres: conn.execute(text("SET LOCAL enable_seqscan = off"))
+        for name, query in index_check_queries().items():
+            sql = str(query.compile(db.engine, compile_kwargs={'literal_binds': True}))
+            if is_postgres:
+                plan = '\n'.join(r[0] for r in conn.execute(text(f"EXPLAIN {sql}")))
+                used = 'Index' in plan
+            else:
+                plan = '\n'.join(r[-1] for r in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+                used = 'INDEX' in plan
+            results.append((name, used, plan))
+        conn.rollback()
+    return results
+
+
+# --- 이벤트 파티션 / 요약 ---
+# event_log 는 EVENT_PARTITION_PERIOD 단위 기간(event_log_pYYYYMM 또는 event_log_pYYYYMMDD)으로 나눈다.
+# PostgreSQL 은 event_timestamp RANGE 파티션(+ DEFAULT 파티션), SQLite 는 새 이벤트가 쌓이는 event_log 와 요약이 끝난 기간을 옮겨 둔 기간별 테이블.
+# 닫힌 날짜는 event_rollup 으로 접히고, 원본 기반 측정결과는 event_rollup + event_compaction 경계 이후의 원본으로 계산한다.
+EVENT_PARTITION_PREFIX = 'event_log_p'
+
+def month_after(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def period_start(day):
+    return day.replace(day=1) if EVENT_PARTITION_PERIOD == 'month' else day
+
+def next_period(start):
+    return month_after(start) if EVENT_PARTITION_PERIOD == 'month' else start + timedelta(days=1)
+
+def partition_name(start):
+    return EVENT_PARTITION_PREFIX + start.strftime('%Y%m' if EVENT_PARTITION_PERIOD == 'month' else '%Y%m%d')
+
+def partition_range(name):
+    # 테이블 이름에서 (시작일, 끝일)을 읽는다. 설정과 다른 단위로 만들어진 기간 테이블도 인식한다.
+    suffix = name[len(EVENT_PARTITION_PREFIX):]
+    if not name.startswith(EVENT_PARTITION_PREFIX) or not suffix.isdigit() or len(suffix) not in (6, 8): return None
+    try:
+        if len(suffix) == 6:
+            start = date(int(suffix[:4]), int(suffix[4:]), 1)
+            return start, month_after(start)
+        start = date(int(suffix[:4]), int(suffix[4:6]), int(suffix[6:]))
+        return start, start + timedelta(days=1)
+    except ValueError:
+        return None
+
+def kst_midnight(day):
+    return datetime(day.year, day.month, day.day, tzinfo=KST)
+
+def event_partition_table(name):
+    # event_log 와 같은 컬럼의 기간별 테이블 (인덱스 없음)
+    return db.Table(name, db.MetaData(), *[db.Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable) for c in EventLog.__table__.columns])
+
+def event_log_partitioned():
+    if db.engine.dialect.name != 'postgresql': return False
+    return db.session.execute(text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('event_log')")).first() is not None
+
+def event_partitions():
+    # (이름, 시작일, 끝일) 목록, 시작일 순
+    if db.engine.dialect.name == 'postgresql':
+        names = db.session.execute(text("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass('event_log')")).scalars().all()
+    else:
+        names = inspect(db.engine).get_table_names()
+    return sorted(((name, *r) for name in names if (r := partition_range(name))), key=lambda p: p[1])
+
+def partition_event_log(chunk_size=10000):
+    """PostgreSQL 의 event_log 를 event_timestamp RANGE 파티션 테이블로 바꿉니다. 이미 바뀌었거나 PostgreSQL 이 아니면 False."""
+    if db.engine.dialect.name != 'postgresql' or event_log_partitioned(): return False
+    table = EventLog.__table__
+    try:
+        db.session.execute(text("ALTER TABLE event_log RENAME TO event_log_unpartitioned"))
+        db.session.execute(text("ALTER TABLE event_log_unpartitioned RENAME CONSTRAINT event_log_pkey TO event_log_unpartitioned_pkey"))
+        for index in table.indexes: db.session.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        # 파티션 키는 PK 에 들어가야 하므로 (id, event_timestamp). id 시퀀스는 새 테이블로 소유권을 옮긴다.
+        db.session.execute(text("CREATE TABLE event_log (LIKE event_log_unpartitioned INCLUDING DEFAULTS, PRIMARY KEY (id, event_timestamp)) PARTITION BY RANGE (event_timestamp)"))
+        sequence = db.session.execute(text("SELECT pg_get_serial_sequence('event_log_unpartitioned', 'id')")).scalar()
+        if sequence: db.session.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY event_log.id"))
+        db.session.execute(text("CREATE TABLE event_log_default PARTITION OF event_log DEFAULT"))
+        first = db.session.execute(text("SELECT min(event_timestamp) FROM event_log_unpartitioned")).scalar()
+        ensure_event_partitions(as_kst(first).date() if first else None, commit=False)
+        last = db.session.execute(text("SELECT min(id) - 1 FROM event_log_unpartitioned")).scalar()
+        while last is not None:
+            upto = db.session.execute(text("SELECT max(id) FROM (SELECT id FROM event_log_unpartitioned WHERE id > :last ORDER BY id LIMIT :limit) chunk"), {'last': last, 'limit': chunk_size}).scalar()
+            if upto is None: break
+            db.session.execute(text("INSERT INTO event_log SELECT * FROM event_log_unpartitioned WHERE id > :last AND id <= :upto"), {'last': last, 'upto': upto})
+            last = upto
+        db.session.execute(text("DROP TABLE event_log_unpartitioned"))
+        for index in table.indexes: db.session.execute(CreateIndex(index, if_not_exists=True))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return True
+
+def ensure_event_partitions(first_day=None, commit=True):
+    """(PostgreSQL) first_day 또는 오늘이 속한 기간부터 EVENT_PARTITIONS_AHEAD 기간 뒤까지 파티션을 만듭니다.
+
+    DEFAULT 파티션에 들어가 있던 그 기간의 행은 새 파티션으로 옮긴 뒤 붙인다. 만든 파티션 이름 목록을 돌려줍니다.
+    """
+    if not event_log_partitioned(): return []
+    existing = event_partitions()
+    today = datetime.now(KST).date()
+    start, last = period_start(first_day or today), period_start(today)
+    for _ in range(EVENT_PARTITIONS_AHEAD): last = next_period(last)
+    created = []
+    while start <= last:
+        end = next_period(start)
+        if not any(s < end and start < e for _, s, e in existing):
+            name, lo, hi = partition_name(start), kst_midnight(start), kst_midnight(end)
+            db.session.execute(text(f"CREATE TABLE {name} (LIKE event_log INCLUDING DEFAULTS)"))
+            db.session.execute(text(f"WITH moved AS (DELETE FROM event_log_default WHERE event_timestamp >= :lo AND event_timestamp < :hi RETURNING *) INSERT INTO {name} SELECT * FROM moved"), {'lo': lo, 'hi': hi})
+            db.session.execute(text(f"ALTER TABLE event_log ATTACH PARTITION {name} FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"))
+            created.append(name)
+        start = end
+    if commit: db.session.commit()
+    return created
+
+def compacted_until(connection=None):
+    if connection is not None: return connection.execute(select(EventCompaction.compacted_until).where(EventCompaction.id == 1)).scalar()
+    watermark = db.session.get(EventCompaction, 1)
+    return watermark.compacted_until if watermark else None
+
+def open_rollup_states(before_day=None):
+    # 쌍별 가장 최근 요약에서 아직 열려 있는 구간: {(login_id, shorts_url): (open_watch_start, open_comment_start)}
+    R = EventRollup
+    latest = select(R.login_id, R.shorts_url, func.max(R.day).label('day')).group_by(R.login_id, R.shorts_url)
+    if before_day is not None: latest = latest.where(R.day < before_day)
+    latest = latest.subquery()
+    q = select(R.login_id, R.shorts_url, R.open_watch_start, R.open_comment_start).join(latest, and_(R.login_id == latest.c.login_id, R.shorts_url == latest.c.shorts_url, R.day == latest.c.day)).where(or_(R.open_watch_start.isnot(None), R.open_comment_start.isnot(None)))
+    return {(login_id, shorts_url): (watch, comment) for login_id, shorts_url, watch, comment in db.session.execute(q)}
+
+def compact_day(day, chunk_size=10000):
+    # 하루치 원본을 update_measurement 로 접어 event_rollup 에 넣고 경계를 그날 끝으로 옮긴다. 전날까지 열린 구간은 이어받는다.
+    lo, hi = kst_midnight(day), kst_midnight(day + timedelta(days=1))
+    carry = open_rollup_states(day)
+    states = {}
+    events_q = select(EventLog.login_id, EventLog.shorts_url, EventLog.event_type, EventLog.event_timestamp).where(EventLog.event_timestamp >= lo, EventLog.event_timestamp < hi, EventLog.shorts_url != 'N/A').order_by(EventLog.event_timestamp, EventLog.id).execution_options(yield_per=chunk_size)
+    for login_id, shorts_url, event_type, event_timestamp in db.session.execute(events_q):
+        state = states.get((login_id, shorts_url))
+        if state is None:
+            open_watch, open_comment = carry.get((login_id, shorts_url), (None, None))
+            state = states[(login_id, shorts_url)] = SimpleNamespace(login_id=login_id, shorts_url=shorts_url, day=day, event_count=0, watch_seconds=0.0, comment_seconds=0.0, first_start_at=None, last_like_at=None, last_dislike_at=None, open_watch_start=open_watch, open_comment_start=open_comment)
+        state.event_count += 1
+        update_measurement(state, event_type, to_kst_naive(event_timestamp))
+    rows = [vars(state) for state in states.values()]
+    for i in range(0, len(rows), chunk_size):
+        db.session.execute(insert(EventRollup), rows[i:i + chunk_size])
+    watermark = db.session.get(EventCompaction, 1) or EventCompaction(id=1)
+    watermark.compacted_until = hi.replace(tzinfo=None)
+    db.session.add(watermark)
+    db.session.commit()
+    return len(rows)
+
+def compact_events():
+    """닫힌 날짜(EVENT_ROLLUP_GRACE 를 둔 어제까지)를 하루씩 요약합니다. 이벤트가 없는 날은 건너뛰며, 요약한 날짜 수를 돌려줍니다."""
+    closed_until = (datetime.now(KST) - EVENT_ROLLUP_GRACE).date()
+    boundary = compacted_until()
+    after = as_kst(boundary) if boundary is not None else None
+    days = 0
+    while True:
+        next_q = db.session.query(func.min(EventLog.event_timestamp))
+        if after is not None: next_q = next_q.filter(EventLog.event_timestamp >= after)
+        next_event = next_q.scalar()
+        if next_event is None: break
+        day = as_kst(next_event).date()
+        if day >= closed_until: break
+        compact_day(day)
+        days += 1
+        after = kst_midnight(day + timedelta(days=1))
+    return days
+
+def detach_compacted_periods():
+    # (SQLite) 요약이 끝난 기간의 행을 event_log 에서 기간별 테이블로 옮긴다. 옮긴 테이블 이름 목록 반환.
+    # 옮긴 행은 관리자 조회/내보내기/초기화에서 보이지 않으므로 maintain_events --detach 로만 실행한다.
+    if db.engine.dialect.name == 'postgresql': return []
+    boundary = compacted_until()
+    table = EventLog.__table__
+    moved = []
+    while boundary is not None:
+        first = db.session.query(func.min(EventLog.event_timestamp)).scalar()
+        if first is None: break
+        start = period_start(as_kst(first).date())
+        end = next_period(start)
+        if datetime(end.year, end.month, end.day) > boundary: break
+        name = partition_name(start)
+        period = event_partition_table(name)
+        period.create(db.session.connection(), checkfirst=True)
+        in_period = and_(table.c.event_timestamp >= kst_midnight(start), table.c.event_timestamp < kst_midnight(end))
+        db.session.execute(insert(period).from_select([c.name for c in table.columns], select(table).where(in_period)))
+        db.session.execute(table.delete().where(in_period))
+        db.session.commit()
+        moved.append(name)
+    return moved
+
+def archive_event_partition(name, chunk_size=ARCHIVE_CHUNK_SIZE):
+    # 기간 테이블을 ARCHIVE_DIR 에 csv.gz 로 남긴다. 호출한 쪽 트랜잭션 안에서 읽는다.
+    table = event_partition_table(name)
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    filename = f"{name}_backup_{datetime.now(KST).strftime('%Y%m%d%H%M%S')}.csv.gz"
+    partial = os.path.join(ARCHIVE_DIR, filename + '.partial')
+    try:
+        with gzip.open(partial, 'wt', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow([c.key for c in table.columns])
+            write_archive_chunks(writer, table, chunk_size=chunk_size, release=False)
+    except Exception:
+        if os.path.exists(partial): os.remove(partial)
+        raise
+    os.replace(partial, os.path.join(ARCHIVE_DIR, filename))
+    return filename
+
+def apply_event_retention():
+    """요약이 끝났고 EVENT_RETENTION_DAYS 보다 오래된 기간 파티션을 (EVENT_RETENTION_ARCHIVE 면 백업 후) 지웁니다."""
+    boundary = compacted_until()
+    if not EVENT_RETENTION_DAYS or boundary is None: return []
+    cutoff = min(boundary.date(), (datetime.now(KST) - timedelta(days=EVENT_RETENTION_DAYS)).date())
+    dropped = []
+    for name, start, end in event_partitions():
+        if end > cutoff: continue
+        try:
+            if db.engine.dialect.name == 'postgresql': db.session.execute(text(f"ALTER TABLE event_log DETACH PARTITION {name}"))
+            if EVENT_RETENTION_ARCHIVE: archive_event_partition(name)
+            db.session.execute(text(f"DROP TABLE {name}"))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        dropped.append(name)
+    return dropped
+
+def refresh_table_statistics():
+    # (SQLite) 관리자 화면의 행 수 추정치를 위해 sqlite_stat1 을 갱신한다. 큰 테이블은 표본만 읽는다. PostgreSQL 은 autovacuum 이 맡는다.
+    if db.engine.dialect.name != 'sqlite': return
+    db.session.execute(text("PRAGMA analysis_limit = 1000"))
+    db.session.execute(text("ANALYZE"))
+    db.session.commit()
+
+def maintain_events(detach=False):
+    """파티션 준비, 닫힌 날짜 요약, (SQLite, detach 일 때) 요약된 기간 분리, 보관 기간 정리를 차례로 실행합니다."""
+    result = {'created': ensure_event_partitions(), 'compacted_days': compact_events(), 'moved': detach_compacted_periods() if detach else [], 'dropped': apply_event_retention()}
+    if result['created'] or result['moved'] or result['dropped']: invalidate_schema_cache()
+    refresh_table_statistics()
+    return result
 
 
 # --- 데이터베이스 명령어 ---
@@ -458,8 +2398,30 @@ def init_db_command():
     """데이터베이스 테이블을 생성합니다."""
     with app.app_context():
         db.create_all()
+        partition_event_log()
+        invalidate_schema_cache()
         print("Initialized the database.")
 
+@app.cli.command("migrate_schema")
+@click.option('--chunk-size', default=10000, show_default=True, help='SQLite 테이블 재작성 시 한 번에 옮기는 행 수')
+def migrate_schema_command(chunk_size):
+    """시각 컬럼을 timestamp 타입으로 바꾸고 새 컬럼과 조회용 인덱스를 추가합니다."""
+    with app.app_context():
+        done = migrate_schema(chunk_size)
+        for step in done: print(f"Migrated: {step}")
+        print("Schema is up to date." if not done else f"Migration finished ({len(done)} steps).")
+
+@app.cli.command("check_indexes")
+@click.option('--verbose', is_flag=True, help='실행 계획 전체 출력')
+def check_indexes_command(verbose):
+    """주요 조회가 인덱스를 사용하는지 EXPLAIN 으로 확인합니다."""
+    with app.app_context():
+        results = check_index_usage()
+        for name, used, plan in results:
+            print(f"[{'OK' if used else 'NO INDEX'}] {name}")
+            if verbose or not used: print('    ' + plan.replace('\n', '\n    '))
+        if not all(used for _, used, _ in results): raise SystemExit(1)
+
 @app.cli.command("reset_comments")
 def reset_comments_command():
     """youtube_comment 테이블을 삭제하고 다시 생성합니다."""
@@ -469,8 +2431,71 @@ def reset_comments_command():
         table.drop(db.engine, checkfirst=True)
         print("Recreating youtube_comment table...")
         table.create(db.engine)
+        invalidate_schema_cache()
         print("youtube_comment table recreated successfully.")
 
+@app.cli.command("rebuild_measurements")
+@click.option('--chunk-size', default=10000, show_default=True, help='event_log 를 읽어 오는 단위')
+@click.option('--verify', is_flag=True, help='재구축 후 pandas 재계산 결과와 비교')
+def rebuild_measurements_command(chunk_size, verify):
+    """event_log 로부터 measurement_aggregate 테이블을 다시 계산합니다."""
+    with app.app_context():
+        db.create_all()
+        count = rebuild_measurements(chunk_size)
+        print(f"Rebuilt {count} measurement rows.")
+        if verify:
+            mismatches = verify_measurements()
+            for key, expected, actual in mismatches[:20]:
+                print(f"Mismatch {key}: expected={expected} actual={actual}")
+            print(f"Verification finished: {len(mismatches)} mismatched rows.")
+
+@app.cli.command("maintain_events")
+@click.option('--detach', is_flag=True, help='(SQLite) 요약된 기간을 event_log_p* 테이블로 옮긴다. 옮긴 행은 관리자 조회/내보내기에서 빠지며, SQLite 의 보관 기간 정리는 옮긴 테이블에만 적용된다.')
+def maintain_events_command(detach):
+    """event_log 파티션을 준비하고 닫힌 날짜를 요약한 뒤 보관 기간이 지난 원본을 정리합니다."""
+    with app.app_context():
+        db.create_all()
+        result = maintain_events(detach)
+        for name in result['created']: print(f"Created partition: {name}")
+        for name in result['moved']: print(f"Moved compacted events to: {name}")
+        for name in result['dropped']: print(f"Dropped partition: {name}")
+        print(f"Compacted {result['compacted_days']} day(s); raw events before {compacted_until() or '-'} are read from event_rollup.")
+
+@app.cli.command("crawl_comments")
+@click.option('--workers', default=CRAWL_WORKERS, show_default=True, help='동시에 API 를 호출하는 워커 수')
+@click.option('--max-comments', default=CRAWL_MAX_COMMENTS, show_default=True, help='영상당 최대 댓글 스레드 수')
+@click.option('--fresh', is_flag=True, help='끝나지 않은 이전 실행을 이어받지 않고 새로 시작')
+def crawl_comments_command(workers, max_comments, fresh):
+    """YouTube 댓글을 수집합니다. 중단된 실행이 있으면 남은 영상부터 이어서 진행합니다."""
+    with app.app_context():
+        db.create_all()
+        result = crawl_comments(max_workers=workers, max_comments=max_comments, resume=not fresh, progress=lambda done, total, comments, message: print(f"({done}/{total}) {message}"))
+        for shorts_url in result['failed']: print(f"Failed: {shorts_url}")
+        print(crawl_summary(result))
+
+@app.cli.command("update_discovery_doc")
+def update_discovery_doc_command():
+    """YouTube Data API 디스커버리 문서를 내려받아 YOUTUBE_DISCOVERY_DOC 에 저장합니다."""
+    import urllib.request
+    with urllib.request.urlopen(YOUTUBE_DISCOVERY_URL, timeout=30) as response: content = response.read().decode('utf-8')
+    doc = json.loads(content)
+    partial = YOUTUBE_DISCOVERY_DOC + '.partial'
+    with open(partial, 'w', encoding='utf-8') as f: f.write(content)
+    os.replace(partial, YOUTUBE_DISCOVERY_DOC)
+    print(f"Saved {doc.get('name')} {doc.get('version')} discovery document (revision {doc.get('revision')}) to {YOUTUBE_DISCOVERY_DOC}")
+
+@app.cli.command("run_jobs")
+def run_jobs_command():
+    """background_job 의 작업을 꺼내 실행하는 작업자입니다. 배포마다 이 프로세스를 하나(이상) 따로 띄웁니다."""
+    with app.app_context():
+        db.create_all()
+    print(f"Job runner started (poll every {JOB_POLL_INTERVAL}s). Press Ctrl+C to stop.")
+    if _job_runner is not None: _job_runner.join()
+    else: _job_runner_loop()
+
+# JOB_RUNNER=1 인 프로세스는 기동 시 러너 스레드를 띄운다 (모든 작업 핸들러가 등록된 뒤)
+if JOB_RUNNER: start_job_runner()
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
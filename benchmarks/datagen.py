@@ -0,0 +1,159 @@
+"""벤치마크용 합성 데이터 생성기. 같은 --seed 와 규모면 항상 같은 데이터를 만든다.
+
+사용자, 숏츠, 댓글 트리(스레드 + 답글), 세션 단위 event_log(로그인 → 시청시작/좋아요/댓글 열기·닫기/시청중지_종료 ...)를
+DATABASE_URL 이 가리키는 DB(SQLite 또는 로컬 PostgreSQL)에 넣고, shorts_activity / user_last_state / measurement_aggregate 를
+앱과 같은 규칙으로 채운다.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.datagen --scale small --reset
+    DATABASE_URL=postgresql://localhost/bench python -m benchmarks.datagen --scale large --reset
+    python -m benchmarks.datagen --users 500 --shorts 200 --sessions 10 --views 15
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench.db'))
+
+import numpy as np
+from sqlalchemy import insert
+
+from app import app, db, KST, LoginUser, Shorts, YoutubeComment, EventLog, ShortsActivity, UserLastState, rebuild_measurements
+
+# (사용자 수, 숏츠 수, 사용자당 세션 수, 세션당 시청 영상 수, 숏츠당 평균 댓글 스레드 수)
+SCALES = {
+    'tiny': (20, 20, 2, 5, 5),
+    'small': (200, 100, 5, 10, 20),
+    'medium': (2000, 500, 10, 15, 40),
+    'large': (20000, 2000, 20, 20, 60),
+}
+USER_PASSWORD = 'bench'
+TOGGLE_EVENTS = [('공유', 'share', 0.05), ('관심없음', 'interest', 0.02), ('채널추천안함', 'recommend', 0.01), ('신고', 'report', 0.005), ('구독', 'subscribe', 0.03)]
+INSERT_CHUNK_SIZE = 10000
+
+
+def user_id(i):
+    return f"bench_user{i:06d}"
+
+def shorts_url(i):
+    return f"https://www.youtube.com/shorts/bench{i:06d}"
+
+def generate_comments(rng, n_shorts, threads_per_shorts, now):
+    # 스레드 수는 영상마다 치우치게(대부분 적고 일부 많게), 답글은 스레드의 30% 에 1~5개
+    for s in range(n_shorts):
+        url = shorts_url(s)
+        for t in range(int(rng.poisson(threads_per_shorts * rng.lognormal(0, 0.8)))):
+            comment_id = f"bench_c{s}_{t}"
+            published = now - timedelta(minutes=int(rng.integers(1, 60 * 24 * 90)))
+            yield {'shorts_url': url, 'comment_id': comment_id, 'parent_id': None, 'author_name': f"viewer{int(rng.integers(0, 10**6))}", 'comment_text': f"댓글 {t}", 'published_at': published, 'like_count': min(int(rng.zipf(2.0)) - 1, 100000), 'author_profile_image_url': None}
+            if rng.random() < 0.3:
+                for r in range(int(rng.integers(1, 6))):
+                    yield {'shorts_url': url, 'comment_id': f"{comment_id}_r{r}", 'parent_id': comment_id, 'author_name': f"viewer{int(rng.integers(0, 10**6))}", 'comment_text': f"답글 {r}", 'published_at': published + timedelta(minutes=r + 1), 'like_count': 0, 'author_profile_image_url': None}
+
+def generate_sessions(rng, n_users, n_shorts, sessions_per_user, views_per_session, start, days):
+    """(이벤트 행 iterator, 최종 활동 상태, 사용자별 마지막 시청 영상). 이벤트는 세션 안에서 시간순."""
+    states, activities, last_watched = {}, {}, {}
+
+    def events():
+        popularity = 1.0 / np.arange(1, n_shorts + 1) ** 0.8  # 인기 영상에 시청이 몰리도록
+        popularity /= popularity.sum()
+        for u in range(n_users):
+            login_id = user_id(u)
+            # 세션은 시간순으로 만들어 마지막 세션의 마지막 영상이 user_last_state 가 되게 한다
+            for s, offset in enumerate(np.sort(rng.uniform(0, days * 86400, sessions_per_user))):
+                session_id = f"bench-{u}-{s}"
+                ts = start + timedelta(seconds=float(offset))
+                yield (login_id, 'N/A', '로그인', session_id, ts)
+                for shorts in rng.choice(n_shorts, size=views_per_session, p=popularity):
+                    url = shorts_url(int(shorts))
+                    state = states.setdefault((login_id, url), {'like': 0, 'dislike': 0, 'share': 0, 'interest': 0, 'recommend': 0, 'report': 0, 'subscribe': 0})
+                    ts += timedelta(seconds=float(rng.uniform(0.5, 3)))
+                    yield (login_id, url, '시청시작', session_id, ts)
+                    last_watched[login_id] = url
+                    watch_end = ts + timedelta(seconds=float(rng.lognormal(2.5, 0.8)))
+                    if rng.random() < 0.15:
+                        # 좋아요/싫어요는 화면과 같이 서로를 취소한다. shorts_activity 행은 앱처럼 첫 활동 이벤트 때 생긴다.
+                        activities[(login_id, url)] = state
+                        like = rng.random() < 0.8
+                        event, other, key, other_key = ('좋아요', '싫어요', 'like', 'dislike') if like else ('싫어요', '좋아요', 'dislike', 'like')
+                        ts += timedelta(seconds=float(rng.uniform(1, 10)))
+                        if state[key]:
+                            yield (login_id, url, event + '취소', session_id, ts)
+                            state[key] = 0
+                        else:
+                            yield (login_id, url, event, session_id, ts)
+                            state[key] = 1
+                            if state[other_key]:
+                                yield (login_id, url, other + '취소', session_id, ts)
+                                state[other_key] = 0
+                    for event, key, probability in TOGGLE_EVENTS:
+                        if rng.random() < probability:
+                            activities[(login_id, url)] = state
+                            ts += timedelta(seconds=float(rng.uniform(0.5, 3)))
+                            yield (login_id, url, event + ('취소' if state[key] else ''), session_id, ts)
+                            state[key] = 1 - state[key]
+                    if rng.random() < 0.1:
+                        ts += timedelta(seconds=float(rng.uniform(1, 5)))
+                        yield (login_id, url, '댓글클릭', session_id, ts)
+                        ts += timedelta(seconds=float(rng.lognormal(2.0, 0.7)))
+                        yield (login_id, url, '댓글닫기클릭', session_id, ts)
+                    # 일부 시청은 종료 이벤트 없이 끊긴다 (앱 종료, 네트워크 단절)
+                    ts = max(ts, watch_end)
+                    if rng.random() < 0.97: yield (login_id, url, '시청중지_종료', session_id, ts)
+
+    return events(), activities, last_watched
+
+def insert_chunks(model, rows, chunk_size=INSERT_CHUNK_SIZE):
+    count, chunk = 0, []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            db.session.execute(insert(model), chunk)
+            db.session.commit()
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(insert(model), chunk)
+        db.session.commit()
+        count += len(chunk)
+    return count
+
+def generate(users, shorts, sessions, views, threads, seed=0, days=7, reset=False, log=print):
+    """합성 데이터를 넣고 테이블별 행 수를 돌려줍니다. 앱 컨텍스트 안에서 호출합니다."""
+    rng = np.random.default_rng(seed)
+    now = datetime.now(KST).replace(microsecond=0)
+    if reset:
+        db.drop_all()
+    db.create_all()
+    counts = {}
+    started = time.perf_counter()
+    counts['login_user'] = insert_chunks(LoginUser, ({'id': user_id(u), 'name': f"벤치 사용자 {u}", 'password': USER_PASSWORD} for u in range(users)))
+    counts['shorts'] = insert_chunks(Shorts, ({'url': shorts_url(s), 'channel_name': f"channel{s % 50}", 'channel_profile_url': None, 'description': f"벤치 숏츠 {s}", 'use_yn': 'Y'} for s in range(shorts)))
+    counts['youtube_comment'] = insert_chunks(YoutubeComment, generate_comments(rng, shorts, threads, now))
+    log(f"users/shorts/comments: {counts} ({time.perf_counter() - started:.1f}s)")
+    events, activities, last_watched = generate_sessions(rng, users, shorts, sessions, views, now - timedelta(days=days), days)
+    counts['event_log'] = insert_chunks(EventLog, ({'login_id': l, 'shorts_url': u, 'event_type': e, 'session_id': s, 'event_timestamp': ts} for l, u, e, s, ts in events))
+    log(f"event_log: {counts['event_log']} rows ({time.perf_counter() - started:.1f}s)")
+    counts['shorts_activity'] = insert_chunks(ShortsActivity, ({'login_id': l, 'shorts_url': u, **state} for (l, u), state in activities.items()))
+    counts['user_last_state'] = insert_chunks(UserLastState, ({'login_id': l, 'last_watched_url': u} for l, u in last_watched.items()))
+    counts['measurement_aggregate'] = rebuild_measurements()
+    log(f"derived tables: {counts} ({time.perf_counter() - started:.1f}s)")
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=SCALES, default='small', help='규모 프리셋 (개별 옵션이 우선)')
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--shorts', type=int)
+    parser.add_argument('--sessions', type=int, help='사용자당 세션 수')
+    parser.add_argument('--views', type=int, help='세션당 시청 영상 수')
+    parser.add_argument('--threads', type=int, help='숏츠당 평균 댓글 스레드 수')
+    parser.add_argument('--days', type=int, default=7, help='세션을 흩뿌릴 최근 기간(일)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--reset', action='store_true', help='모든 테이블을 지우고 새로 만든다')
+    args = parser.parse_args()
+    users, shorts, sessions, views, threads = SCALES[args.scale]
+    with app.app_context():
+        print(f"Target: {db.engine.url.render_as_string(hide_password=True)}")
+        generate(args.users or users, args.shorts or shorts, args.sessions or sessions, args.views or views, args.threads or threads, seed=args.seed, days=args.days, reset=args.reset)
@@ -0,0 +1,217 @@
+"""실제 Flask 앱을 대상으로 한 부하 시나리오. 단계별 처리량과 p50/p95/p99 지연 시간을 보고하고 JSON 으로 저장한다.
+
+시나리오
+  viewer        로그인 → /shorts → /api/shorts → 영상마다 이벤트(시청시작 … 시청중지_종료) 기록 → 일부 영상 /get_comments
+                이벤트는 index.html 처럼 영상 하나 분량을 /log_events 한 번에 age_ms 와 함께 보낸다 (--event-endpoint single 이면 옛 /log_event 건별 전송)
+  measurements  관리자 측정결과 화면 (/admin?table=measurement_results)
+  export        관리자 엑셀 다운로드 (/admin/download_excel)
+
+기본은 같은 프로세스에서 Flask test client 로 앱을 호출하고, --base-url 을 주면 로컬 gunicorn 같은 실행 중인 서버에 HTTP 로 요청한다.
+데이터는 benchmarks.datagen 으로 미리 만들거나 --generate 로 만든다. --baseline 을 주면 이전 결과와 비교한다.
+
+    export DATABASE_URL=sqlite:////tmp/bench.db
+    python -m benchmarks.load --generate small --scenario viewer measurements --concurrency 8 --duration 30
+    gunicorn -w 4 app:app &
+    python -m benchmarks.load --base-url http://127.0.0.1:8000 --scenario viewer --baseline benchmarks/results/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench.db'))
+
+import numpy as np
+import requests
+
+from app import app, db, KST, MEASUREMENT_SOURCE, LoginUser, Shorts
+from benchmarks import datagen
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+SUPER_ADMIN = {'user_id': 'super_admin', 'password': '0604'}
+PERCENTILES = (50, 95, 99)
+
+
+class TestClientTransport:
+    # 같은 프로세스의 앱을 WSGI 로 직접 호출한다. 스레드마다 하나씩 만든다.
+    name = 'test_client'
+
+    def __init__(self):
+        self.client = app.test_client()
+
+    def request(self, method, path, **kwargs):
+        response = self.client.open(path, method=method, **kwargs)
+        return response.status_code, len(response.get_data())
+
+class HttpTransport:
+    def __init__(self, base_url):
+        self.name = base_url
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def request(self, method, path, data=None, json=None, query_string=None, headers=None):
+        response = self.session.request(method, self.base_url + path, data=data, json=json, params=query_string, headers=headers, allow_redirects=False)
+        return response.status_code, len(response.content)
+
+
+def viewer_scenario(call, rng, ctx, state):
+    login_id = datagen.user_id(rng.randrange(ctx['users']))
+    call('login', 'POST', '/login', ok=(302,), data={'user_id': login_id, 'password': datagen.USER_PASSWORD})
+    call('shorts_page', 'GET', '/shorts')
+    call('api_shorts', 'GET', '/api/shorts')
+    session_id = str(uuid.uuid4())
+    for _ in range(ctx['views']):
+        shorts_url = rng.choice(ctx['urls'])
+        events = ['시청시작'] + (['좋아요'] if rng.random() < 0.15 else []) + (['댓글클릭', '댓글닫기클릭'] if rng.random() < 0.1 else []) + ['시청중지_종료']
+        if ctx['event_endpoint'] == 'single':
+            for event_type in events:
+                call('log_event', 'POST', '/log_event', json={'login_id': login_id, 'shorts_url': shorts_url, 'event_type': event_type, 'session_id': session_id})
+        else:
+            # 버퍼에 머문 시간: 시청 중 이벤트가 몇 초 간격으로 쌓였다가 마지막 이벤트와 함께 전송된 것으로 본다
+            offsets = sorted(rng.randint(0, 30000) for _ in events)
+            batch = [{'shorts_url': shorts_url, 'event_type': event_type, 'age_ms': offsets[-1] - offset} for event_type, offset in zip(events, offsets)]
+            call('log_events', 'POST', '/log_events', json={'login_id': login_id, 'session_id': session_id, 'events': batch})
+        if rng.random() < 0.3: call('get_comments', 'GET', '/get_comments', query_string={'url': shorts_url})
+
+def admin_login(call, state):
+    if not state.get('admin'):
+        call('admin_login', 'POST', '/login', ok=(302,), data=SUPER_ADMIN)
+        state['admin'] = True
+
+def measurements_scenario(call, rng, ctx, state):
+    admin_login(call, state)
+    call('measurement_results', 'GET', '/admin', query_string={'table': 'measurement_results'})
+
+def export_scenario(call, rng, ctx, state):
+    admin_login(call, state)
+    call('download_excel', 'POST', '/admin/download_excel', data={'table_name_for_download': ctx['export_table'], 'export_format': ctx['export_format']})
+
+SCENARIOS = {'viewer': viewer_scenario, 'measurements': measurements_scenario, 'export': export_scenario}
+
+
+def run_worker(scenario, transport, ctx, seed, deadline, iterations):
+    # (단계별 지연 시간 목록, 단계별 오류 수, 반복 횟수). 예외도 오류로 센다.
+    rng, state = random.Random(seed), {}
+    samples, errors = defaultdict(list), Counter()
+
+    def call(step, method, path, ok=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            status, _ = transport.request(method, path, **kwargs)
+        except Exception:
+            status = None
+        samples[step].append(time.perf_counter() - started)
+        if status not in ok: errors[step] += 1
+        return status
+
+    done = 0
+    while (done < iterations) if iterations else (time.perf_counter() < deadline):
+        scenario(call, rng, ctx, state)
+        done += 1
+    return samples, errors, done
+
+def run_scenario(name, make_transport, ctx, concurrency, duration, iterations, seed):
+    """동시 사용자 concurrency 명으로 시나리오를 duration 초 (또는 사용자당 iterations 회) 실행한 결과."""
+    transports = [make_transport() for _ in range(concurrency)]
+    started = time.perf_counter()
+    deadline = started + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(lambda i: run_worker(SCENARIOS[name], transports[i], ctx, seed * 1000 + i, deadline, iterations), range(concurrency)))
+    elapsed = time.perf_counter() - started
+    samples, errors = defaultdict(list), Counter()
+    for worker_samples, worker_errors, _ in outcomes:
+        for step, values in worker_samples.items(): samples[step].extend(values)
+        errors.update(worker_errors)
+    total = sum(done for _, _, done in outcomes)
+    return {'elapsed_s': round(elapsed, 3), 'iterations': total, 'iterations_per_s': round(total / elapsed, 2), 'steps': {step: summarize(values, errors[step], elapsed) for step, values in samples.items()}}
+
+def summarize(values, errors, elapsed):
+    ms = np.array(values) * 1000
+    summary = {'count': len(values), 'errors': errors, 'throughput_per_s': round(len(values) / elapsed, 2), 'mean_ms': round(float(ms.mean()), 2), 'max_ms': round(float(ms.max()), 2)}
+    summary.update({f"p{p}_ms": round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(ms, PERCENTILES))})
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_report(name, result):
+    print(f"\n[{name}] {result['iterations']} iterations in {result['elapsed_s']}s ({result['iterations_per_s']}/s)")
+    print(f"  {'step':<20} {'count':>7} {'err':>5} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  (ms)")
+    for step, s in result['steps'].items():
+        print(f"  {step:<20} {s['count']:>7} {s['errors']:>5} {s['throughput_per_s']:>9} {s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9} {s['max_ms']:>9}")
+
+def compare(baseline, current, tolerance):
+    """같은 시나리오/단계끼리 p95 와 처리량을 비교해 허용 범위를 벗어난 항목 목록을 돌려줍니다."""
+    regressions = []
+    for name, result in current['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base: continue
+        print(f"\n[{name}] vs baseline ({baseline['meta'].get('git_commit')}, {baseline['meta'].get('created_at')})")
+        for step, s in result['steps'].items():
+            b = base['steps'].get(step)
+            if not b: continue
+            p95_ratio = s['p95_ms'] / b['p95_ms'] if b['p95_ms'] else 1.0
+            rate_ratio = s['throughput_per_s'] / b['throughput_per_s'] if b['throughput_per_s'] else 1.0
+            regressed = p95_ratio > 1 + tolerance or rate_ratio < 1 - tolerance
+            print(f"  {step:<20} p95 {b['p95_ms']:>9} -> {s['p95_ms']:>9} ({p95_ratio - 1:+.0%})  req/s {b['throughput_per_s']:>9} -> {s['throughput_per_s']:>9} ({rate_ratio - 1:+.0%}){'  REGRESSION' if regressed else ''}")
+            if regressed: regressions.append((name, step))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', nargs='+', choices=SCENARIOS, default=['viewer'])
+    parser.add_argument('--concurrency', type=int, default=4, help='동시 가상 사용자 수')
+    parser.add_argument('--duration', type=float, default=10, help='시나리오당 실행 시간(초)')
+    parser.add_argument('--iterations', type=int, help='주면 --duration 대신 가상 사용자당 이 횟수만큼 반복')
+    parser.add_argument('--views', type=int, default=5, help='viewer 시나리오의 로그인당 시청 영상 수')
+    parser.add_argument('--event-endpoint', choices=['batch', 'single'], default='batch', help='viewer 이벤트 전송 방식: batch=/log_events, single=옛 /log_event')
+    parser.add_argument('--export-table', default='event_log')
+    parser.add_argument('--export-format', choices=['xlsx', 'csv'], default='xlsx')
+    parser.add_argument('--base-url', help='실행 중인 서버 주소 (없으면 test client)')
+    parser.add_argument('--generate', choices=datagen.SCALES, help='실행 전에 이 규모로 데이터를 새로 만든다 (--reset)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help=f"결과 JSON 경로 (기본: {os.path.relpath(RESULTS_DIR)}/<시각>.json)")
+    parser.add_argument('--baseline', help='비교할 이전 결과 JSON')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='p95/처리량이 이 비율 이상 나빠지면 회귀로 본다')
+    parser.add_argument('--fail-on-regression', action='store_true', help='회귀가 있으면 종료 코드 1')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.generate: datagen.generate(*datagen.SCALES[args.generate], seed=args.seed, reset=True)
+        users = LoginUser.query.filter(LoginUser.id.like('bench_user%')).count()
+        urls = [url for (url,) in db.session.query(Shorts.url).filter_by(use_yn='Y')]
+        dialect = db.engine.dialect.name
+    if not users or not urls: sys.exit("벤치마크 데이터가 없습니다. python -m benchmarks.datagen 으로 먼저 만들거나 --generate 를 주세요.")
+    ctx = {'users': users, 'urls': urls, 'views': args.views, 'event_endpoint': args.event_endpoint, 'export_table': args.export_table, 'export_format': args.export_format}
+    make_transport = (lambda: HttpTransport(args.base_url)) if args.base_url else TestClientTransport
+
+    report = {'meta': {
+        'created_at': datetime.now(KST).isoformat(timespec='seconds'), 'git_commit': git_commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+        'transport': args.base_url or TestClientTransport.name, 'database': dialect, 'measurement_source': MEASUREMENT_SOURCE,
+        'concurrency': args.concurrency, 'duration_s': args.duration, 'iterations': args.iterations, 'views': args.views, 'event_endpoint': args.event_endpoint, 'seed': args.seed, 'users': users, 'shorts': len(urls),
+    }, 'scenarios': {}}
+    for name in args.scenario:
+        result = report['scenarios'][name] = run_scenario(name, make_transport, ctx, args.concurrency, args.duration, args.iterations, args.seed)
+        print_report(name, result)
+
+    path = args.save or os.path.join(RESULTS_DIR, f"{datetime.now(KST).strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f: json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nSaved: {path}")
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f: baseline = json.load(f)
+        regressions = compare(baseline, report, args.tolerance)
+        if regressions and args.fail_on_regression: sys.exit(1)
@@ -0,0 +1,107 @@
+"""generate_measurement_results 구간 계산 엔진의 동등성 검사 및 마이크로 벤치마크.
+
+    python -m benchmarks.measurement_durations --check
+    python -m benchmarks.measurement_durations --sizes 100000 1000000 10000000
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import numpy as np
+import pandas as pd
+
+from app import sequential_durations, format_actions
+
+EVENT_TYPES = ['시청시작', '시청중지_종료', '댓글클릭', '댓글닫기클릭', '좋아요', '싫어요', '공유']
+
+
+# --- 기존(행 단위) 구현: 비교 기준 ---
+def legacy_sequential_durations(logs_sorted, start_event, end_event):
+    def calculate_sequential_duration(group_df, start_event, end_event):
+        total_duration = 0
+        start_time = None
+        for _, row in group_df.iterrows():
+            if row['event_type'] == start_event:
+                if start_time is None: start_time = row['event_timestamp']
+            elif row['event_type'] == end_event:
+                if start_time is not None:
+                    duration = (row['event_timestamp'] - start_time).total_seconds()
+                    total_duration += duration
+                    start_time = None
+        return total_duration
+    view_logs = logs_sorted[logs_sorted['event_type'].isin([start_event, end_event])]
+    agg = view_logs.groupby(['login_id', 'shorts_url'])[['event_type', 'event_timestamp']].apply(calculate_sequential_duration, start_event, end_event)
+    return pd.DataFrame(agg, columns=['duration']).reset_index()
+
+def legacy_format_actions(result_df, action_col, time_col):
+    def format_action(row, action_col, time_col):
+        state = row[action_col]
+        time = row.get(time_col, 0)
+        if state == 1 and time > 0:
+            return f"1({time})"
+        return str(int(state))
+    return result_df.apply(lambda row: format_action(row, action_col, time_col), axis=1)
+
+
+def random_logs(n_events, n_users, n_shorts, seed):
+    # 반복 시작, 짝 없는 종료, 같은 시각의 이벤트가 섞인 임의 이벤트 스트림
+    rng = np.random.default_rng(seed)
+    users = np.array([f"user{i}" for i in range(n_users)], dtype=object)
+    shorts = np.array([f"https://youtube.com/shorts/v{i}" for i in range(n_shorts)], dtype=object)
+    offsets_ms = np.cumsum(rng.integers(0, 3000, n_events))
+    logs = pd.DataFrame({
+        'login_id': users[rng.integers(0, n_users, n_events)],
+        'shorts_url': shorts[rng.integers(0, n_shorts, n_events)],
+        'event_type': np.array(EVENT_TYPES, dtype=object)[rng.integers(0, len(EVENT_TYPES), n_events)],
+        'event_timestamp': pd.Timestamp('2025-03-01') + pd.to_timedelta(offsets_ms, unit='ms'),
+    })
+    return logs.sort_values(by=['login_id', 'shorts_url', 'event_timestamp'])
+
+def random_results(n_rows, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        '좋아요': rng.integers(0, 2, n_rows).astype(float),
+        'time_to_like': np.where(rng.random(n_rows) < 0.3, 0.0, np.round(rng.normal(20, 30, n_rows), 1)),
+    })
+
+
+def check(trials):
+    for seed in range(trials):
+        rng = np.random.default_rng(seed)
+        logs_sorted = random_logs(int(rng.integers(1, 2000)), int(rng.integers(1, 8)), int(rng.integers(1, 8)), seed)
+        for start_event, end_event in [('시청시작', '시청중지_종료'), ('댓글클릭', '댓글닫기클릭')]:
+            expected = legacy_sequential_durations(logs_sorted, start_event, end_event)
+            actual = sequential_durations(logs_sorted, start_event, end_event)
+            merged = expected.merge(actual, on=['login_id', 'shorts_url'], how='outer', suffixes=('_legacy', '_vectorized'), indicator=True)
+            assert (merged['_merge'] == 'both').all(), f"seed {seed}: pair sets differ"
+            assert (merged['duration_legacy'] == merged['duration_vectorized']).all(), f"seed {seed}: durations differ"
+        results = random_results(int(rng.integers(1, 500)), seed)
+        assert legacy_format_actions(results, '좋아요', 'time_to_like').equals(format_actions(results, '좋아요', 'time_to_like')), f"seed {seed}: format differs"
+    print(f"OK: {trials} random event streams matched the row-by-row implementation.")
+
+def bench(sizes, legacy_max):
+    for n in sizes:
+        logs_sorted = random_logs(n, max(n // 2000, 1), 300, seed=n)
+        started = time.perf_counter()
+        sequential_durations(logs_sorted, '시청시작', '시청중지_종료')
+        vectorized = time.perf_counter() - started
+        line = f"{n:>10,d} events  vectorized {vectorized:8.3f}s"
+        if n <= legacy_max:
+            started = time.perf_counter()
+            legacy_sequential_durations(logs_sorted, '시청시작', '시청중지_종료')
+            legacy = time.perf_counter() - started
+            line += f"  row-by-row {legacy:8.3f}s  ({legacy / vectorized:,.0f}x)"
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--check', action='store_true', help='기존 구현과 결과가 같은지 임의 스트림으로 검사')
+    parser.add_argument('--trials', type=int, default=200)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10**5, 10**6, 10**7])
+    parser.add_argument('--legacy-max', type=int, default=10**5, help='이 크기 이하에서만 행 단위 구현도 측정')
+    args = parser.parse_args()
+    if args.check: check(args.trials)
+    else: bench(args.sizes, args.legacy_max)
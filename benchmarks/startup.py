@@ -0,0 +1,96 @@
+"""워커 기동 비용 측정: app 모듈 import 시간과 RSS, 그리고 /log_event 만 처리한 워커가 어떤 무거운 모듈을 올렸는지.
+
+매 실행을 새 파이썬 프로세스에서 하므로 gunicorn 워커가 새로 뜰 때와 같은 조건이다. --rev 를 주면 그 리비전의 app.py 를
+임시 디렉터리에 꺼내 같은 방식으로 측정해 나란히 보여 준다.
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --rev HEAD~1 --save /tmp/startup.json
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['pandas', 'numpy', 'googleapiclient', 'openpyxl', 'xlsxwriter']
+
+# 자식 프로세스에서 실행한다. 결과는 마지막 줄에 JSON 으로 출력.
+PROBE = """
+import json, os, resource, sys, time
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(line.split()[1]) for line in f if line.startswith('VmRSS:')) / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+heavy = %(heavy)r
+result = {'baseline_rss_mb': rss_mb()}
+started = time.perf_counter()
+import app
+result['import_s'] = time.perf_counter() - started
+result['import_rss_mb'] = rss_mb()
+result['loaded_after_import'] = [m for m in heavy if m in sys.modules]
+with app.app.app_context(): app.db.create_all()
+client = app.app.test_client()
+started = time.perf_counter()
+response = client.post('/log_event', json={'login_id': 'u', 'shorts_url': 's', 'event_type': '시청시작', 'session_id': 'x'})
+assert response.status_code == 200, response.status_code
+result['first_log_event_s'] = time.perf_counter() - started
+result['log_event_rss_mb'] = rss_mb()
+result['loaded_after_log_event'] = [m for m in heavy if m in sys.modules]
+print(json.dumps(result))
+"""
+
+def probe(app_dir, db_path):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", EVENT_WRITE_BEHIND='0', JOB_RUNNER='0', PYTHONDONTWRITEBYTECODE='1')
+    if os.path.exists(db_path): os.remove(db_path)
+    output = subprocess.run([sys.executable, '-c', PROBE % {'heavy': HEAVY_MODULES}], cwd=app_dir, env=env, capture_output=True, text=True)
+    if output.returncode: raise RuntimeError(output.stderr.strip().splitlines()[-1] if output.stderr.strip() else f"exit {output.returncode}")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def measure(app_dir, runs, workdir):
+    samples = [probe(app_dir, os.path.join(workdir, 'startup.db')) for _ in range(runs)]
+    summary = {key: round(statistics.median(s[key] for s in samples), 4) for key in ('import_s', 'first_log_event_s', 'baseline_rss_mb', 'import_rss_mb', 'log_event_rss_mb')}
+    summary['loaded_after_import'] = samples[-1]['loaded_after_import']
+    summary['loaded_after_log_event'] = samples[-1]['loaded_after_log_event']
+    return summary
+
+def checkout(rev, workdir):
+    # 그 리비전의 app.py 만 꺼내고 templates/static 은 현재 것을 링크한다 (import 와 /log_event 에는 영향 없음)
+    target = os.path.join(workdir, rev.replace('/', '_').replace('~', '_'))
+    os.makedirs(target)
+    source = subprocess.run(['git', 'show', f"{rev}:app.py"], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    with open(os.path.join(target, 'app.py'), 'w', encoding='utf-8') as f: f.write(source)
+    for name in ('templates', 'static'): os.symlink(os.path.join(ROOT, name), os.path.join(target, name))
+    return target
+
+def print_report(results):
+    labels = list(results)
+    print(f"{'':<24}" + ''.join(f"{label:>22}" for label in labels))
+    for key, unit in [('import_s', 's'), ('first_log_event_s', 's'), ('baseline_rss_mb', 'MB'), ('import_rss_mb', 'MB'), ('log_event_rss_mb', 'MB')]:
+        print(f"{key + ' (' + unit + ')':<24}" + ''.join(f"{results[label][key]:>22}" for label in labels))
+    for key in ('loaded_after_import', 'loaded_after_log_event'):
+        print(f"{key:<24}" + ''.join(f"{','.join(results[label][key]) or '-':>22}" for label in labels))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='측정 반복 횟수 (중앙값을 보고)')
+    parser.add_argument('--rev', help='비교할 git 리비전 (예: HEAD~1)')
+    parser.add_argument('--save', help='결과 JSON 경로')
+    args = parser.parse_args()
+    workdir = tempfile.mkdtemp(prefix='startup-bench-')
+    try:
+        results = {}
+        if args.rev: results[args.rev] = measure(checkout(args.rev, workdir), args.runs, workdir)
+        results['working tree'] = measure(ROOT, args.runs, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print_report(results)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f: json.dump({'python': sys.version.split()[0], 'runs': args.runs, 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"Saved: {args.save}")
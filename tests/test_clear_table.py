@@ -0,0 +1,54 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+_tmp = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp, 'test.db')
+os.environ['ARCHIVE_DIR'] = os.path.join(_tmp, 'archives')
+os.environ['EVENT_WRITE_BEHIND'] = '0'
+os.environ['JOB_RUNNER'] = '0'
+
+import app as A
+
+
+@pytest.fixture
+def client():
+    with A.app.app_context():
+        A.db.drop_all()
+        A.db.create_all()
+        client = A.app.test_client()
+        with client.session_transaction() as s: s['user_role'] = 'super_admin'
+        yield client
+
+
+def watch(login_id, shorts_url, start, seconds):
+    A.apply_events([(login_id, shorts_url, '시청시작', 'sess', start), (login_id, shorts_url, '시청중지_종료', 'sess', start + timedelta(seconds=seconds))])
+
+
+def test_clearing_event_log_resets_measurements(client):
+    start = datetime.now(A.KST) - timedelta(days=3)
+    watch('u1', 's1', start, 7)
+    watch('u1', 's1', datetime.now(A.KST) - timedelta(minutes=5), 12)
+    assert A.compact_events() >= 1
+    assert A.MeasurementAggregate.query.one().watch_seconds == pytest.approx(19)
+
+    assert client.post('/admin/clear_table', data={'table': 'event_log'}).status_code == 302
+
+    assert A.EventLog.query.count() == 0
+    assert A.EventRollup.query.count() == 0
+    assert A.compacted_until() is None
+    assert A.MeasurementAggregate.query.count() == 0
+    assert A.get_measurement_results('', '')[0] == []
+
+
+def test_clearing_comments_resets_commented_flag(client):
+    with client.session_transaction() as s: s.update(user_role='user', user_id='u1')
+    assert client.post('/add_comment', json={'shorts_url': 's1', 'comment_text': 'hi'}).status_code == 200
+    assert A.MeasurementAggregate.query.one().commented == 1
+
+    with client.session_transaction() as s: s['user_role'] = 'super_admin'
+    client.post('/admin/clear_table', data={'table': 'youtube_comment'})
+
+    assert A.MeasurementAggregate.query.filter_by(commented=1).count() == 0